@@ -4,6 +4,7 @@ import streamlit as st
 import altair as alt
 import io
 import re
+import time
 import matplotlib.pyplot as plt
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet
@@ -17,15 +18,32 @@ except Exception:
     ChatOllama = None  # type: ignore
 
 
-from src.analysis_pipeline import inspect_uploaded_file, run_full_simulation_analysis
-
-
-# LLM bağlantısı kontrolü
-if ChatOllama is not None:
+from src.analysis_pipeline import (
+    collect_backtest_result,
+    collect_simulation_result,
+    get_returns_index,
+    inspect_uploaded_file,
+    list_saved_runs,
+    load_runs_for_comparison,
+    load_saved_run,
+    save_current_run,
+    submit_backtest_analysis,
+    submit_simulation_analysis,
+)
+from src.run_store import describe_run
+from src.simulation_engine import RANK_METRICS, RETURN_FREQUENCIES
+from src.simulation_planner import describe_plan
+
+
+@st.cache_resource(show_spinner=False)
+def get_llm_client():
+    """LLM istemcisi tüm oturumlarda paylaşılır; Ollama yoksa None döner"""
+    if ChatOllama is None:
+        return None
     try:
-        _ = ChatOllama(model="qwen2.5:7b-instruct", temperature=0)
+        return ChatOllama(model="qwen2.5:7b-instruct", temperature=0)
     except Exception:
-        pass
+        return None
 
 
 def generate_ai_summary_text(results: dict, params: dict) -> str:
@@ -58,10 +76,10 @@ def generate_ai_summary_text(results: dict, params: dict) -> str:
         return " ".join(parts)
 
     # LLM kullanılabilirse özet üret
-    if ChatOllama is None:
+    llm = get_llm_client()
+    if llm is None:
         return fallback()
     try:
-        llm = ChatOllama(model="qwen2.5:7b-instruct", temperature=0)
         prompt = (
             "Aşağıdaki Monte Carlo sonuçlarına göre, yalnızca Türkçe tek paragraf bir finansal özet yaz. "
             "Riskleri ve olası senaryoları 4-6 cümlede açıkla. Ön-ek, talimat, madde işareti, başlık, meta-yorum verme.\n\n"
@@ -90,9 +108,85 @@ def generate_ai_summary_text(results: dict, params: dict) -> str:
         return fallback()
 
 
-def _matplotlib_hist_image(end_prices: np.ndarray) -> bytes:
+def _band_frame(summary: dict) -> pd.DataFrame:
+    """Çalışma özetindeki yüzdelik bantları grafik tablosuna çevirir"""
+    bands = summary["bands"]
+    return pd.DataFrame({
+        "Periyot": np.arange(bands.shape[1]),
+        "p05": bands[0],
+        "p25": bands[1],
+        "p50": bands[2],
+        "p75": bands[3],
+        "p95": bands[4],
+    })
+
+
+def _sample_path_frame(summary: dict, max_points: int = 500) -> pd.DataFrame:
+    """Çalışma özetindeki örnek yolları uzun formatta grafik tablosuna çevirir (uzun ufuklarda seyreltilir)"""
+    paths = summary["sample_paths"]
+    step = max(1, -(-paths.shape[0] // max_points))
+    periods = np.arange(0, paths.shape[0], step)
+    return pd.DataFrame({
+        "Periyot": np.repeat(periods, paths.shape[1]),
+        "Fiyat": paths[::step].ravel(),
+        "Yol": np.tile(np.arange(paths.shape[1]), len(periods)),
+    })
+
+
+def _wait_for_job(job) -> None:
+    """Havuz işi bitene kadar kuyruk sırasını veya çalışma durumunu gösterir"""
+    status_box = st.empty()
+    while not job.done():
+        position = job.position()
+        if position > 1:
+            status_box.info(f"İşiniz sırada: önünüzde {position - 1} iş var.")
+        elif position == 1:
+            status_box.info("İşiniz sıradaki iş; boş bir işçi veya yeterli bellek bütçesi bekleniyor.")
+        else:
+            status_box.info("İşiniz çalışıyor...")
+        time.sleep(0.5)
+    status_box.empty()
+
+
+def _tail_risk_frame(rows: list, analytic_rows: list = None) -> pd.DataFrame:
+    """Çok düzeyli VaR/CVaR tablosunu gösterim tablosuna çevirir; varsa kapalı form değerleri eklenir"""
+    frame = pd.DataFrame(rows)[["horizon", "confidence", "var_value", "var_return_pct", "cvar_value", "cvar_return_pct"]]
+    if analytic_rows:
+        analytic = pd.DataFrame(analytic_rows)[["horizon", "confidence", "var_value", "cvar_value"]]
+        frame = frame.merge(
+            analytic.rename(columns={"var_value": "analytic_var_value", "cvar_value": "analytic_cvar_value"}),
+            on=["horizon", "confidence"],
+            how="left",
+        )
+    frame["confidence"] = frame["confidence"] * 100.0
+    return frame.rename(columns={
+        "horizon": "Ufuk (Periyot)",
+        "confidence": "Güven (%)",
+        "var_value": "VaR",
+        "var_return_pct": "VaR Getiri (%)",
+        "cvar_value": "CVaR",
+        "cvar_return_pct": "CVaR Getiri (%)",
+        "analytic_var_value": "Log-normal VaR",
+        "analytic_cvar_value": "Log-normal CVaR",
+    })
+
+
+def _hist_frame(summary: dict) -> pd.DataFrame:
+    """Çalışma özetindeki bitiş fiyatı histogramını grafik tablosuna çevirir"""
+    edges = summary["hist_edges"]
+    counts = summary["hist_counts"]
+    return pd.DataFrame({
+        "bin_start": edges[:-1],
+        "bin_end": edges[1:],
+        "count": counts,
+        "density": counts / max(counts.sum(), 1) / np.maximum(np.diff(edges), 1e-12),
+    })
+
+
+def _matplotlib_hist_image(summary: dict) -> bytes:
+    edges = summary["hist_edges"]
     fig, ax = plt.subplots(figsize=(6, 3))
-    ax.hist(end_prices, bins=50, color="#4C78A8")
+    ax.stairs(summary["hist_counts"], edges, fill=True, color="#4C78A8")
     ax.set_title("Bitiş Fiyatları Dağılımı")
     ax.set_xlabel("Bitiş Fiyatı")
     ax.set_ylabel("Frekans")
@@ -119,13 +213,9 @@ def _matplotlib_paths_image(price_paths: np.ndarray, num_paths: int = 50) -> byt
     return buf.read()
 
 
-def _matplotlib_bands_image(price_paths: np.ndarray) -> bytes:
-    periods = np.arange(price_paths.shape[0])
-    p05 = np.percentile(price_paths, 5, axis=1)
-    p25 = np.percentile(price_paths, 25, axis=1)
-    p50 = np.percentile(price_paths, 50, axis=1)
-    p75 = np.percentile(price_paths, 75, axis=1)
-    p95 = np.percentile(price_paths, 95, axis=1)
+def _matplotlib_bands_image(summary: dict) -> bytes:
+    p05, p25, p50, p75, p95 = summary["bands"]
+    periods = np.arange(len(p50))
 
     fig, ax = plt.subplots(figsize=(6, 3))
     ax.fill_between(periods, p05, p95, color="#4C78A8", alpha=0.2, label="%5-%95")
@@ -142,9 +232,9 @@ def _matplotlib_bands_image(price_paths: np.ndarray) -> bytes:
     return buf.read()
 
 
-def _get_pdf_styles() -> dict:
-    """PDF için Türkçe karakter desteği sağlar"""
-    styles = getSampleStyleSheet()
+@st.cache_resource(show_spinner=False)
+def _register_pdf_font():
+    """Türkçe karakterli TTF fontu süreç başına bir kez kaydeder; bulunamazsa None döner"""
     # Türkçe karakterler için TTF font yolları
     possible_paths = [
         "./fonts/DejaVuSans.ttf",
@@ -164,16 +254,25 @@ def _get_pdf_styles() -> dict:
     if chosen_font:
         try:
             pdfmetrics.registerFont(TTFont("DejaVuSans", chosen_font))
-            # Tüm PDF stillerine font uygula
-            for name in ["Title", "Heading1", "Heading2", "Heading3", "BodyText", "Normal"]:
-                if name in styles:
-                    styles[name].fontName = "DejaVuSans"
+            return "DejaVuSans"
         except Exception:
             pass
+    return None
+
+
+def _get_pdf_styles() -> dict:
+    """PDF için Türkçe karakter desteği sağlar"""
+    styles = getSampleStyleSheet()
+    font_name = _register_pdf_font()
+    if font_name:
+        # Tüm PDF stillerine font uygula
+        for name in ["Title", "Heading1", "Heading2", "Heading3", "BodyText", "Normal"]:
+            if name in styles:
+                styles[name].fontName = font_name
     return styles
 
 
-def build_pdf_report(results: dict, params: dict, ai_summary: str, price_paths: np.ndarray) -> bytes:
+def build_pdf_report(results: dict, params: dict, ai_summary: str, summary: dict) -> bytes:
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4)
     styles = _get_pdf_styles()
@@ -200,14 +299,17 @@ def build_pdf_report(results: dict, params: dict, ai_summary: str, price_paths:
     story.append(Spacer(1, 12))
 
     # Grafikler ekle
-    end_prices = price_paths[-1]
-    hist_bytes = _matplotlib_hist_image(end_prices)
-    bands_bytes = _matplotlib_bands_image(price_paths)
+    hist_bytes = _matplotlib_hist_image(summary)
+    bands_bytes = _matplotlib_bands_image(summary)
     story.append(Paragraph("Dağılım Grafiği", styles["Heading2"]))
     story.append(RLImage(io.BytesIO(hist_bytes), width=480, height=240))
     story.append(Spacer(1, 12))
     story.append(Paragraph("Fiyat Yolu Bant Grafiği (Medyan + %25/%75 + %5/%95)", styles["Heading2"]))
     story.append(RLImage(io.BytesIO(bands_bytes), width=480, height=240))
+    if "sample_paths" in summary:
+        story.append(Spacer(1, 12))
+        story.append(Paragraph("Örnek Fiyat Yolları", styles["Heading2"]))
+        story.append(RLImage(io.BytesIO(_matplotlib_paths_image(summary["sample_paths"])), width=480, height=240))
 
     doc.build(story)
     buffer.seek(0)
@@ -228,8 +330,8 @@ if "analysis_results" not in st.session_state:
     st.session_state.analysis_results = None
 if "dataframe" not in st.session_state:
     st.session_state.dataframe = None
-if "price_paths" not in st.session_state:
-    st.session_state.price_paths = None
+if "run_summary" not in st.session_state:
+    st.session_state.run_summary = None
 
 
 def set_state(state: str) -> None:
@@ -251,6 +353,29 @@ if st.session_state.current_state == "INIT":
         set_state("INSPECTING")
         st.rerun()
 
+    # Kayıtlı analizler: yeniden simülasyon yapmadan aç veya karşılaştır
+    saved_runs = list_saved_runs()
+    if saved_runs:
+        st.divider()
+        st.subheader("Kayıtlı Analizler")
+        run_labels = {r["run_id"]: describe_run(r) for r in saved_runs}
+        col_load, col_compare = st.columns(2)
+        with col_load:
+            run_to_load = st.selectbox("Analizi Aç:", list(run_labels), format_func=run_labels.get)
+            if st.button("Sonuçları Yükle"):
+                loaded = load_saved_run(run_to_load)
+                if loaded.get("error"):
+                    st.error(loaded["error"])
+                else:
+                    set_state("DONE")
+                    st.rerun()
+        with col_compare:
+            runs_to_compare = st.multiselect("Karşılaştırılacak Analizler:", list(run_labels), format_func=run_labels.get)
+            if st.button("Karşılaştır", disabled=len(runs_to_compare) < 2):
+                st.session_state.compare_run_ids = runs_to_compare
+                set_state("COMPARE")
+                st.rerun()
+
 elif st.session_state.current_state == "INSPECTING":
     st.header("1. Adım: Veri Yükleyin")
     st.success(f"Dosya Yüklendi: `{st.session_state.uploaded_file.name}`")
@@ -296,19 +421,35 @@ elif st.session_state.current_state == "CONFIRM":
             )
             date_col = st.selectbox("Tarih Sütunu:", all_cols, index=date_col_index)
 
+            # Uzun formatta (tarih, sembol, fiyat) sembol sütunu seçimi
+            ticker_col = None
+            if results.get("layout") == "long":
+                ticker_col_index = (
+                    all_cols.index(results["suggested_ticker_col"]) if results["suggested_ticker_col"] in all_cols else 0
+                )
+                ticker_col = st.selectbox(
+                    "Sembol Sütunu:",
+                    all_cols,
+                    index=ticker_col_index,
+                    help=f"Uzun format tespit edildi ({results.get('num_tickers')} sembol). Tüm semboller toplu simüle edilir.",
+                )
+
             price_col_options = results["suggested_price_cols"] if results["suggested_price_cols"] else all_cols
             price_col = st.selectbox("Fiyat/Getiri Sütunu:", price_col_options)
 
-            try:
-                last_price = (
-                    pd.to_numeric(st.session_state.dataframe[price_col], errors='coerce').dropna().iloc[-1]
-                )
-            except Exception:
-                last_price = 100.0
+            if ticker_col is None:
+                # Dosya sırası yerine tarih sırasındaki son fiyat (simülasyonun kullandığı indeksle aynı)
+                try:
+                    last_price = get_returns_index(date_col, price_col)["last_price"]
+                except Exception:
+                    last_price = 100.0
 
-            start_price = st.number_input(
-                "Simülasyon Başlangıç Fiyatı:", value=float(last_price), format="%.2f"
-            )
+                start_price = st.number_input(
+                    "Simülasyon Başlangıç Fiyatı:", value=float(last_price), format="%.2f"
+                )
+            else:
+                start_price = 0.0
+                st.info("Başlangıç fiyatı her sembol için son geçerli fiyat olarak alınır.")
 
         with col2:
             st.subheader("Simülasyon Ayarları")
@@ -316,6 +457,26 @@ elif st.session_state.current_state == "CONFIRM":
                 "Kullanıcı Tipi:", ["Bireysel (Basit)", "Kurumsal (Gelişmiş)"], horizontal=True
             )
 
+            # Tek sembolde getiriler dosya, haftalık veya aylık frekansta simüle edilebilir
+            frequency = "native"
+            if ticker_col is None:
+                frequency = st.selectbox(
+                    "Getiri Frekansı:",
+                    list(RETURN_FREQUENCIES),
+                    format_func=RETURN_FREQUENCIES.get,
+                    help="Periyot sayısı seçilen frekansta yorumlanır (ör. Aylık + 12 periyot = 1 yıl).",
+                )
+
+            # Çok sembolde sıralama metriği seçilebilir
+            rank_by = "cvar_95_return_pct"
+            if ticker_col is not None:
+                rank_by = st.selectbox(
+                    "Sıralama Metriği:",
+                    list(RANK_METRICS),
+                    format_func=RANK_METRICS.get,
+                    help="Semboller seçilen metriğe göre en iyiden en kötüye sıralanır.",
+                )
+
             if user_type == "Bireysel (Basit)":
                 num_periods = st.selectbox(
                     "Simülasyon Süresi:", [21, 63, 126, 252], format_func=lambda x: f"{x} Periyot (Gün/Ay)"
@@ -323,7 +484,9 @@ elif st.session_state.current_state == "CONFIRM":
                 num_scenarios = 10000
                 st.info("Bireysel modda senaryo sayısı 10.000 olarak sabitlenmiştir.")
             else:
-                num_periods = st.number_input("Simülasyon Periyodu (Gün/Ay):", value=252)
+                num_periods = st.number_input(
+                    "Simülasyon Periyodu (Gün/Ay):", value=252, min_value=1, max_value=10000, step=1
+                )
                 num_scenarios = st.number_input(
                     "Senaryo Sayısı:", value=20000, min_value=1000, max_value=100000, step=1000
                 )
@@ -335,9 +498,12 @@ elif st.session_state.current_state == "CONFIRM":
                 "header_row_index": int(header_row_index),
                 "date_col": date_col,
                 "price_col": price_col,
+                "ticker_col": ticker_col,
                 "start_price": float(start_price),
                 "num_periods": int(num_periods),
                 "num_scenarios": int(num_scenarios),
+                "frequency": frequency,
+                "rank_by": rank_by,
             }
             set_state("ANALYZING")
             st.rerun()
@@ -345,27 +511,91 @@ elif st.session_state.current_state == "CONFIRM":
 elif st.session_state.current_state == "ANALYZING":
     st.header("3. Adım: Analiz Sonuçları")
 
-    with st.spinner("Simülasyon çalışıyor..."):
-        params = st.session_state.run_params
-
-        # Monte Carlo simülasyonunu çalıştır
-        response = run_full_simulation_analysis(
-            date_col=params["date_col"],
-            price_col=params["price_col"],
-            start_price=params["start_price"],
-            num_periods=params["num_periods"],
-            num_scenarios=params["num_scenarios"],
-            header_row_index=params["header_row_index"],
+    params = st.session_state.run_params
+
+    # Simülasyon paylaşılan havuza gönderilir; sayfa yenilense de aynı iş beklenir
+    if "simulation_submission" not in st.session_state:
+        st.session_state.simulation_submission = submit_simulation_analysis(params)
+    submission = st.session_state.simulation_submission
+
+    if submission.get("error"):
+        response = submission
+    else:
+        job = submission["job"]
+        if submission.get("plan"):
+            st.caption(f"Çalıştırma planı: {describe_plan(submission['plan'])}")
+        if submission.get("preview"):
+            st.markdown("**Hızlı Önizleme (Log-normal Kapalı Form)**")
+            st.dataframe(_tail_risk_frame(submission["preview"]), hide_index=True, use_container_width=True)
+        with st.spinner("Simülasyon çalışıyor..."):
+            _wait_for_job(job)
+        response = collect_simulation_result(submission)
+        params["num_scenarios"] = submission["num_scenarios"]
+    del st.session_state.simulation_submission
+
+    st.session_state.analysis_results = response if isinstance(response, dict) else {"error": "Beklenmedik hata oluştu."}
+
+    if st.session_state.analysis_results.get("error"):
+        st.error(st.session_state.analysis_results["error"])
+        set_state("CONFIRM")
+    else:
+        set_state("DONE_MULTI" if params.get("ticker_col") else "DONE")
+        st.rerun()
+
+elif st.session_state.current_state == "DONE_MULTI":
+    st.header("3. Adım: Analiz Sonuçları")
+
+    results = st.session_state.analysis_results
+    ranking = results["ranking"]
+
+    st.subheader(
+        f"{results['num_tickers']} Sembol için {results['num_scenarios']} Senaryolu Toplu Analiz"
+    )
+    if results.get("downscaled_from"):
+        st.warning(
+            f"Sunucu bellek bütçesi nedeniyle senaryo sayısı {results['downscaled_from']} yerine "
+            f"{results['num_scenarios']} olarak çalıştırıldı."
+        )
+    if results.get("skipped_tickers"):
+        st.warning(
+            f"Yetersiz veri veya sabit fiyat nedeniyle atlanan semboller: {', '.join(results['skipped_tickers'])}"
         )
 
-        st.session_state.analysis_results = response if isinstance(response, dict) else {"error": "Beklenmedik hata oluştu."}
+    rank_by = results.get("rank_by", "cvar_95_return_pct")
+    st.subheader(f"Risk Sıralaması ({RANK_METRICS.get(rank_by, rank_by)} değerine göre, en iyi en üstte)")
+    st.dataframe(
+        ranking,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "rank": "Sıra",
+            "ticker": "Sembol",
+            "start_price": st.column_config.NumberColumn("Başlangıç", format="%.2f"),
+            "average_end_price": st.column_config.NumberColumn("Ortalama Bitiş", format="%.2f"),
+            "median_end_price": st.column_config.NumberColumn("Medyan Bitiş", format="%.2f"),
+            "gain_probability_pct": st.column_config.NumberColumn("Kazanma %", format="%.2f"),
+            "var_95_value": st.column_config.NumberColumn("VaR 95%", format="%.2f"),
+            "var_95_return_pct": st.column_config.NumberColumn("VaR 95% Getiri", format="%.2f%%"),
+            "cvar_95_value": st.column_config.NumberColumn("CVaR 95%", format="%.2f"),
+            "cvar_95_return_pct": st.column_config.NumberColumn("CVaR 95% Getiri", format="%.2f%%"),
+            "historical_mean_return": st.column_config.NumberColumn("Ort. Getiri", format="%.6f"),
+            "historical_volatility": st.column_config.NumberColumn("Volatilite", format="%.6f"),
+        },
+    )
 
-        if st.session_state.analysis_results.get("error"):
-            st.error(st.session_state.analysis_results["error"])
-            set_state("CONFIRM")
-        else:
-            set_state("DONE")
-            st.rerun()
+    st.download_button(
+        label="Sıralamayı CSV Olarak İndir",
+        data=ranking.to_csv(index=False).encode("utf-8"),
+        file_name="FinSim_Sembol_Risk_Siralamasi.csv",
+        mime="text/csv",
+    )
+
+    if st.button("Yeni Analiz Yap"):
+        for key in list(st.session_state.keys()):
+            if key != 'current_state':
+                del st.session_state[key]
+        set_state("INIT")
+        st.rerun()
 
 elif st.session_state.current_state == "DONE":
     st.header("3. Adım: Analiz Sonuçları")
@@ -377,6 +607,12 @@ elif st.session_state.current_state == "DONE":
         f"'{st.session_state.run_params['price_col']}' için {st.session_state.run_params['num_scenarios']} Senaryolu Analiz"
     )
 
+    if results.get("downscaled_from"):
+        st.warning(
+            f"Sunucu bellek bütçesi nedeniyle senaryo sayısı {results['downscaled_from']} yerine "
+            f"{results['num_scenarios']} olarak çalıştırıldı."
+        )
+
     col1, col2, col3, col4 = st.columns(4)
     col1.metric("Kazanma Olasılığı", f"{results['gain_probability_pct']:.2f}%")
     col2.metric("Ortalama Bitiş Fiyatı", f"{results['average_end_price']:.2f}")
@@ -398,17 +634,57 @@ elif st.session_state.current_state == "DONE":
             f"{results['cvar_95_return_pct']:.2f}% Getiri/Kayıp",
         )
 
+    if "median_max_drawdown_pct" in results:
+        st.caption(
+            f"Medyan maksimum düşüş: %{results['median_max_drawdown_pct']:.2f} · "
+            f"Simülasyon motoru: {results.get('simulation_engine', 'numpy')} · "
+            f"Getiri frekansı: {RETURN_FREQUENCIES.get(results.get('frequency', 'native'))}"
+        )
+
+    if results.get("plan"):
+        plan = results["plan"]
+        with st.expander("Çalıştırma Planı (Tahmini ve Gerçekleşen Maliyet)"):
+            st.markdown(f"**Plan:** {describe_plan(plan)}  \n{plan['reason']}")
+            actual_bytes = results.get("actual_bytes")
+            st.dataframe(
+                pd.DataFrame({
+                    "Ölçüt": ["Bellek (MB)", "Süre (sn)"],
+                    "Tahmini": [plan["estimated_bytes"] / 1024 ** 2, plan["estimated_seconds"]],
+                    "Gerçekleşen": [
+                        actual_bytes / 1024 ** 2 if actual_bytes is not None else None,
+                        results["actual_seconds"],
+                    ],
+                }),
+                hide_index=True,
+            )
+            if actual_bytes is None:
+                rss = results.get("process_peak_rss_bytes")
+                st.caption(
+                    "İş içi bellek izleme kapalı (FINSIM_TRACE_MEMORY=1 ile açılır)."
+                    + (f" Sunucu sürecinin tepe RSS değeri: {rss / 1024 ** 2:.0f} MB." if rss else "")
+                )
+            elif not results.get("actual_bytes_exclusive", True):
+                st.caption("Ölçüm sırasında başka işler de çalıştığı için gerçekleşen bellek yaklaşık değerdir.")
+
+    if results.get("tail_risk"):
+        with st.expander("Çok Düzeyli VaR/CVaR (Monte Carlo ve Log-normal Karşılaştırma)"):
+            st.dataframe(
+                _tail_risk_frame(results["tail_risk"], results.get("analytic_tail_risk")),
+                hide_index=True,
+                use_container_width=True,
+            )
+            st.caption("Log-normal değerler yalnızca son ufuk için, tarihi log getirilerden kapalı formda hesaplanır.")
+
     st.subheader("Simülasyon Dağılım Grafiği (Bitiş Fiyatları)")
-    price_paths = st.session_state.price_paths
-    end_prices = price_paths[-1]
-    chart_data = pd.DataFrame({"Bitiş Fiyatları": end_prices})
+    run_summary = st.session_state.run_summary
     hist_chart = (
-        alt.Chart(chart_data)
+        alt.Chart(_hist_frame(run_summary))
         .mark_bar()
         .encode(
-            x=alt.X("Bitiş Fiyatları", bin=alt.Bin(maxbins=100), title="Bitiş Fiyatı"),
-            y=alt.Y("count()", title="Senaryo Sayısı"),
-            tooltip=[alt.X("Bitiş Fiyatları", bin=alt.Bin(maxbins=100)), "count()"],
+            x=alt.X("bin_start:Q", title="Bitiş Fiyatı"),
+            x2="bin_end:Q",
+            y=alt.Y("count:Q", title="Senaryo Sayısı"),
+            tooltip=["bin_start:Q", "bin_end:Q", "count:Q"],
         )
         .properties(title=f"{st.session_state.run_params['num_scenarios']} Senaryonun Dağılımı")
         .interactive()
@@ -416,28 +692,94 @@ elif st.session_state.current_state == "DONE":
     st.altair_chart(hist_chart, use_container_width=True)
 
     st.subheader("Fiyat Yolu Bant Grafiği (Median + %25/%75 + %5/%95)")
-    periods = np.arange(price_paths.shape[0])
-    p05 = np.percentile(price_paths, 5, axis=1)
-    p25 = np.percentile(price_paths, 25, axis=1)
-    p50 = np.percentile(price_paths, 50, axis=1)
-    p75 = np.percentile(price_paths, 75, axis=1)
-    p95 = np.percentile(price_paths, 95, axis=1)
-    band_df = pd.DataFrame({
-        "Periyot": periods,
-        "p05": p05,
-        "p25": p25,
-        "p50": p50,
-        "p75": p75,
-        "p95": p95,
-    })
-
-    base = alt.Chart(band_df).encode(x="Periyot")
+    base = alt.Chart(_band_frame(run_summary)).encode(x="Periyot")
     band_95 = base.mark_area(opacity=0.2, color="#4C78A8").encode(y="p05", y2="p95")
     band_50 = base.mark_area(opacity=0.35, color="#4C78A8").encode(y="p25", y2="p75")
     median_line = base.mark_line(color="#B279A2", strokeWidth=2).encode(y="p50")
     band_chart = (band_95 + band_50 + median_line).properties(title="Senaryo Bantları ve Medyan")
     st.altair_chart(band_chart.interactive(), use_container_width=True)
 
+    # Örnek yollar kayıtta da tutulur; yeniden yüklenen çalışmalarda da gösterilir
+    if "sample_paths" in run_summary:
+        st.subheader("Örnek Fiyat Yolları")
+        paths_chart = (
+            alt.Chart(_sample_path_frame(run_summary))
+            .mark_line(opacity=0.3, strokeWidth=1)
+            .encode(x="Periyot:Q", y=alt.Y("Fiyat:Q", scale=alt.Scale(zero=False)), color=alt.Color("Yol:N", legend=None))
+            .properties(title=f"{run_summary['sample_paths'].shape[1]} Senaryonun Fiyat Yolu")
+        )
+        st.altair_chart(paths_chart.interactive(), use_container_width=True)
+
+    # Model doğrulama (VaR geriye dönük testi); kayıttan yüklenen çalışmalarda veri yoktur
+    if st.session_state.dataframe is not None:
+        st.subheader("Model Doğrulama (VaR Geriye Dönük Test)")
+        with st.form("backtest_form"):
+            bt_col1, bt_col2, bt_col3, bt_col4 = st.columns(4)
+            bt_window = bt_col1.number_input("Pencere (Periyot):", value=250, min_value=20, step=10)
+            bt_expanding = bt_col2.radio("Pencere Tipi:", ["Kayan", "Genişleyen"], horizontal=True) == "Genişleyen"
+            bt_engine = bt_col3.radio(
+                "Motor:",
+                ["monte_carlo", "historical"],
+                format_func=lambda x: "Monte Carlo" if x == "monte_carlo" else "Tarihsel",
+                horizontal=True,
+            )
+            bt_scenarios = bt_col4.number_input("Senaryo/Adım:", value=2000, min_value=500, max_value=20000, step=500)
+            bt_submitted = st.form_submit_button("Geriye Dönük Testi Çalıştır")
+
+        if bt_submitted:
+            # Geriye dönük test de paylaşılan havuzda ve bellek bütçesi içinde çalışır
+            bt_submission = submit_backtest_analysis(
+                date_col=st.session_state.run_params["date_col"],
+                price_col=st.session_state.run_params["price_col"],
+                window=int(bt_window),
+                expanding=bt_expanding,
+                engine=bt_engine,
+                num_scenarios=int(bt_scenarios),
+            )
+            if bt_submission.get("error"):
+                st.session_state.backtest_results = bt_submission
+            else:
+                with st.spinner("Geriye dönük test çalışıyor..."):
+                    _wait_for_job(bt_submission["job"])
+                st.session_state.backtest_results = collect_backtest_result(bt_submission)
+
+        backtest = st.session_state.get("backtest_results")
+        if backtest:
+            if backtest.get("error"):
+                st.error(backtest["error"])
+            else:
+                bt_m1, bt_m2, bt_m3, bt_m4 = st.columns(4)
+                bt_m1.metric(
+                    "İstisna Oranı",
+                    f"{backtest['exception_rate_pct']:.2f}%",
+                    f"Beklenen {backtest['expected_rate_pct']:.2f}%",
+                    delta_color="off",
+                )
+                bt_m2.metric("İstisna / Gözlem", f"{backtest['num_exceptions']} / {backtest['num_observations']}")
+                bt_m3.metric("Kupiec POF p-değeri", f"{backtest['kupiec']['p_value']:.3f}")
+                bt_m4.metric("Christoffersen p-değeri", f"{backtest['christoffersen']['p_value']:.3f}")
+
+                if backtest["kupiec"]["p_value"] < 0.05 or backtest["conditional_coverage"]["p_value"] < 0.05:
+                    st.warning("Model %5 anlamlılık düzeyinde reddedildi: VaR tahminleri gerçekleşen kayıplarla uyumlu değil.")
+                else:
+                    st.success("Model %5 anlamlılık düzeyinde reddedilmedi.")
+
+                forecasts = backtest["forecasts"]
+                base_bt = alt.Chart(forecasts).encode(x=alt.X("date:T", title="Tarih"))
+                realized_line = base_bt.mark_line(color="#4C78A8", opacity=0.6).encode(
+                    y=alt.Y("realized_return:Q", title="Getiri")
+                )
+                var_line = base_bt.mark_line(color="#E45756").encode(y="var_return:Q")
+                exception_points = (
+                    alt.Chart(forecasts[forecasts["exception"]])
+                    .mark_point(color="#E45756", filled=True)
+                    .encode(x="date:T", y="realized_return:Q", tooltip=["date:T", "realized_return:Q", "var_return:Q"])
+                )
+                st.altair_chart(
+                    (realized_line + var_line + exception_points).properties(title="Gerçekleşen Getiri ve VaR 95% Tahmini"),
+                    use_container_width=True,
+                )
+
     # AI yorum ve PDF raporu
     st.subheader("AI Yorum ve PDF Raporu")
     col_a, col_b = st.columns(2)
@@ -455,7 +797,7 @@ elif st.session_state.current_state == "DONE":
         if st.button("PDF Raporu Oluştur"):
             params = st.session_state.run_params
             ai_text = st.session_state.get("ai_summary") or generate_ai_summary_text(results, params)
-            pdf_bytes = build_pdf_report(results, params, ai_text, price_paths)
+            pdf_bytes = build_pdf_report(results, params, ai_text, run_summary)
             st.session_state.report_pdf = pdf_bytes
             st.success("PDF raporu hazırlandı.")
 
@@ -502,9 +844,9 @@ elif st.session_state.current_state == "DONE":
             return "Bu metrik sorunuz için belirgin eşleşme bulamadım; lütfen daha spesifik sorar mısınız?"
 
         # LLM kullanılabilirse kullan, yoksa kural tabanlı yanıt
-        if ChatOllama is not None:
+        llm = get_llm_client()
+        if llm is not None:
             try:
-                llm = ChatOllama(model="qwen2.5:7b-instruct", temperature=0)
                 sys_ctx = (
                     "Türkçe konuşan finans analisti asistanısın. Aşağıdaki simülasyon sonuçlarını referans alarak "
                     "kısa ve teknik, yanıltıcı olmayan yanıtlar ver. Sayıları yuvarlama: 2 ondalık.")
@@ -527,6 +869,16 @@ elif st.session_state.current_state == "DONE":
         st.session_state.chat_history.append({"role": "assistant", "content": answer})
         st.rerun()
 
+    # Çalışmayı kompakt formatta kaydet
+    if st.session_state.get("loaded_run_id"):
+        st.info(f"Bu sonuçlar kayıtlı analizden yüklendi: `{st.session_state.loaded_run_id}`")
+    elif st.button("Analizi Kaydet"):
+        saved = save_current_run()
+        if saved.get("error"):
+            st.error(saved["error"])
+        else:
+            st.success(f"Analiz kaydedildi: `{saved['run_id']}`")
+
     if st.button("Yeni Analiz Yap"):
         for key in list(st.session_state.keys()):
             if key != 'current_state':
@@ -534,4 +886,69 @@ elif st.session_state.current_state == "DONE":
         set_state("INIT")
         st.rerun()
 
+elif st.session_state.current_state == "COMPARE":
+    st.header("Kayıtlı Analizlerin Karşılaştırılması")
+
+    loaded = load_runs_for_comparison(st.session_state.get("compare_run_ids", []))
+    if loaded.get("error"):
+        st.error(loaded["error"])
+        runs = []
+    else:
+        runs = loaded["runs"]
+
+    if runs:
+        # Farklı başlangıç fiyatları karşılaştırılabilsin diye getiri (%) cinsinden çizilir
+        table_rows, band_frames, dist_frames = [], [], []
+        for run in runs:
+            label = f"{run['created_at']} · {run['params'].get('price_col')}"
+            metrics = run["metrics"]
+            start = metrics["start_price"]
+            table_rows.append({
+                "Analiz": label,
+                "Senaryo": run["params"].get("num_scenarios"),
+                "Periyot": run["params"].get("num_periods"),
+                "Başlangıç": start,
+                "Ortalama Bitiş": metrics["average_end_price"],
+                "Medyan Bitiş": metrics["median_end_price"],
+                "Kazanma %": metrics["gain_probability_pct"],
+                "VaR 95% Getiri %": metrics["var_95_return_pct"],
+                "CVaR 95% Getiri %": metrics["cvar_95_return_pct"],
+            })
+
+            bands = _band_frame(run["summary"])
+            for name in ["p05", "p25", "p50", "p75", "p95"]:
+                bands[name] = (bands[name] / start - 1.0) * 100.0
+            bands["Analiz"] = label
+            band_frames.append(bands)
+
+            hist = _hist_frame(run["summary"])
+            dist_frames.append(pd.DataFrame({
+                "Getiri (%)": ((hist["bin_start"] + hist["bin_end"]) / 2.0 / start - 1.0) * 100.0,
+                "Yoğunluk": hist["density"] * start / 100.0,
+                "Analiz": label,
+            }))
+
+        st.dataframe(pd.DataFrame(table_rows), use_container_width=True, hide_index=True)
+
+        st.subheader("Medyan ve %5-%95 Bantları (Getiri %)")
+        band_df = pd.concat(band_frames, ignore_index=True)
+        base = alt.Chart(band_df).encode(x="Periyot:Q", color="Analiz:N")
+        band_chart = (
+            base.mark_area(opacity=0.15).encode(y=alt.Y("p05:Q", title="Getiri (%)"), y2="p95:Q")
+            + base.mark_line(strokeWidth=2).encode(y="p50:Q")
+        )
+        st.altair_chart(band_chart.interactive(), use_container_width=True)
+
+        st.subheader("Bitiş Getirisi Dağılımları")
+        dist_chart = (
+            alt.Chart(pd.concat(dist_frames, ignore_index=True))
+            .mark_line(interpolate="step-after")
+            .encode(x="Getiri (%):Q", y="Yoğunluk:Q", color="Analiz:N")
+        )
+        st.altair_chart(dist_chart.interactive(), use_container_width=True)
+
+    if st.button("Geri Dön"):
+        set_state("INIT")
+        st.rerun()
+
 
@@ -0,0 +1 @@
+# Testlerin `src` paketini depo kökünden içe aktarabilmesi için kök dizin pytest'e tanıtılır.
@@ -0,0 +1,43 @@
+"""
+NumPy ve Numba simülasyon motorlarının süre ve dağılım karşılaştırması.
+
+Kullanım:
+    python scripts/benchmark_engines.py --scenarios 20000 --periods 252 --repeats 3
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.simulation_engine import compare_simulation_engines  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Simülasyon motoru karşılaştırması")
+    parser.add_argument("--scenarios", type=int, default=20000)
+    parser.add_argument("--periods", type=int, default=252)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--start-price", type=float, default=100.0)
+    parser.add_argument("--mean", type=float, default=0.0005)
+    parser.add_argument("--volatility", type=float, default=0.02)
+    args = parser.parse_args()
+
+    returns = pd.Series(np.random.default_rng(0).normal(args.mean, args.volatility, 1000))
+    comparison = compare_simulation_engines(
+        args.start_price, returns, args.scenarios, args.periods, repeats=args.repeats
+    )
+
+    speedup = comparison.pop("speedup", None)
+    table = pd.DataFrame(comparison).T
+    print(f"{args.scenarios} senaryo x {args.periods} periyot, en iyi {args.repeats} tekrar")
+    print(table.to_string(float_format=lambda x: f"{x:.4f}"))
+    if speedup is not None:
+        print(f"Numba hızlanması: {speedup:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,97 @@
-from typing import Any, Dict, Optional
+import hashlib
+import io
+import os
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 
+from src.backtest_engine import estimate_backtest_bytes, run_var_backtest
 from src.data_inspector import inspect_and_load_data
+from src.execution import SimulationJob, SimulationWorkerPool, process_peak_rss_bytes, traced_peak_bytes
+from src.run_store import list_runs, load_run, save_run, summarize_price_paths, summarize_simulation
 from src.simulation_engine import (
+    analyze_batched_results,
     analyze_simulation_results,
-    calculate_returns,
+    build_returns_index,
+    calculate_returns_by_ticker,
+    estimate_batched_simulation_bytes,
+    run_batched_monte_carlo_simulation,
     run_monte_carlo_simulation,
+    resolve_simulation_engine,
+    run_streaming_monte_carlo_simulation,
+    select_returns,
 )
+from src.simulation_planner import (
+    calibrate_planner,
+    calibration_bytes,
+    estimate_plan_seconds,
+    get_job_memory_budget,
+    minimum_plan_bytes,
+    plan_simulation,
+)
+from src.tail_risk import lognormal_tail_risk
+
+
+# Bütçeye sığdırmak için küçültmede inilebilecek en düşük senaryo sayısı
+MIN_SCENARIOS = 1000
+
+
+@st.cache_resource(show_spinner=False)
+def get_simulation_pool() -> SimulationWorkerPool:
+    """Tüm oturumların paylaştığı sınırlı simülasyon havuzu (FINSIM_MAX_WORKERS, FINSIM_MEMORY_BUDGET_MB)"""
+    max_workers = int(os.environ.get("FINSIM_MAX_WORKERS", min(4, os.cpu_count() or 1)))
+    budget_mb = int(os.environ.get("FINSIM_MEMORY_BUDGET_MB", 2048))
+    pool = SimulationWorkerPool(max_workers=max_workers, memory_budget_bytes=budget_mb * 1024 ** 2)
+    # Süre kalibrasyonu (ve Numba derlemesi) açılışta ilk havuz işi olarak bütçe içinde çalışır;
+    # planlayıcı yalnızca sonucu okur. Numba yalnızca tek işçide "auto" ile seçilir
+    engines = ["numpy"] if max_workers > 1 else ["numpy", resolve_simulation_engine("auto")]
+    pool.submit("__calibration__", calibrate_planner, engines, estimated_bytes=calibration_bytes())
+    return pool
+
+
+def memory_tracing_enabled() -> bool:
+    """İş içi tracemalloc ölçümü yalnızca FINSIM_TRACE_MEMORY=1 ile açılır (tüm süreci yavaşlatır)"""
+    return os.environ.get("FINSIM_TRACE_MEMORY") == "1"
+
+
+def get_session_id() -> str:
+    """Oturum bazlı adil sıralama için kalıcı kimlik"""
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    return st.session_state.session_id
+
+
+def _file_fingerprint(uploaded_file) -> Tuple[str, bytes]:
+    """Dosya içeriği ve özet anahtarı (oturumlar arası önbellek için)"""
+    data = uploaded_file.getvalue()
+    return hashlib.sha1(data).hexdigest(), data
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def _inspect_file(file_digest: str, file_name: str, _file_bytes: bytes) -> Dict[str, Any]:
+    """Aynı dosyanın incelemesi tüm oturumlarda paylaşılır (salt okunur)"""
+    buffer = io.BytesIO(_file_bytes)
+    buffer.name = file_name
+    return inspect_and_load_data(buffer)
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def _load_table(file_digest: str, file_name: str, header_row_index: int, _file_bytes: bytes) -> pd.DataFrame:
+    """Aynı dosya ve başlık satırı için ayrıştırılmış tablo tüm oturumlarda paylaşılır (salt okunur)"""
+    buffer = io.BytesIO(_file_bytes)
+    if file_name.lower().endswith('.csv'):
+        df = pd.read_csv(buffer, header=header_row_index, engine="python")
+    else:
+        df = pd.read_excel(
+            buffer,
+            header=header_row_index,
+            engine="openpyxl" if file_name.lower().endswith('.xlsx') else None,
+        )
+    return df.dropna(how='all')
 
 
 def inspect_uploaded_file(uploaded_file_name: str) -> Dict[str, Any]:
@@ -17,64 +100,382 @@ def inspect_uploaded_file(uploaded_file_name: str) -> Dict[str, Any]:
         return {"error": "Kullanıcı henüz bir dosya yüklemedi."}
 
     uploaded_file = st.session_state.uploaded_file
-    uploaded_file.seek(0)
+    file_digest, file_bytes = _file_fingerprint(uploaded_file)
 
-    inspection_result = inspect_and_load_data(uploaded_file)
+    # Paylaşılan sonucu değiştirmemek için kopya üzerinde çalış
+    inspection_result = dict(_inspect_file(file_digest, uploaded_file.name, file_bytes))
 
     if inspection_result.get("dataframe") is not None:
         st.session_state.dataframe = inspection_result.pop("dataframe")
+        st.session_state.table_key = (file_digest, "inspect")
 
     return inspection_result
 
 
-def run_full_simulation_analysis(
+def _reload_with_header(header_row_index: Optional[int]) -> None:
+    """Kullanıcının onayladığı başlık satırıyla dosyayı yeniden okur"""
+    if header_row_index is None or "uploaded_file" not in st.session_state:
+        return
+
+    uploaded_file = st.session_state.uploaded_file
+    file_digest, file_bytes = _file_fingerprint(uploaded_file)
+    st.session_state.dataframe = _load_table(file_digest, uploaded_file.name, int(header_row_index), file_bytes)
+    st.session_state.table_key = (file_digest, int(header_row_index))
+
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def _returns_index(table_key: Tuple[str, Any], date_col: str, price_col: str, _df: pd.DataFrame) -> Dict[str, Any]:
+    """Aynı tablo ve sütunlar için getiri indeksi tüm oturumlarda paylaşılır (salt okunur)"""
+    return build_returns_index(_df, date_col, price_col)
+
+
+def get_returns_index(date_col: str, price_col: str) -> Dict[str, Any]:
+    """Oturumdaki tablo için (dosya, başlık satırı, sütunlar) bazında önbelleklenmiş getiri indeksi"""
+    df = st.session_state.dataframe
+    table_key = st.session_state.get("table_key")
+    if table_key is None:
+        return build_returns_index(df, date_col, price_col)
+    return _returns_index(table_key, date_col, price_col, df)
+
+
+def _simulate_single(
+    returns: pd.Series,
+    start_price: float,
+    num_periods: int,
+    num_scenarios: int,
+    plan: Optional[Dict[str, Any]] = None,
+    frequency: str = "native",
+) -> Dict[str, Any]:
+    """Tek sembollü simülasyon ve analiz (oturum durumuna dokunmaz, havuz işçisinde çalışabilir)"""
+    # İş başına bağımsız üreteç: eşzamanlı işler global RNG kilidinde sıraya girmez
+    rng = np.random.default_rng()
+    # Plan kalibrasyon bitmeden yapıldıysa süre tahmini simülasyon başlamadan tamamlanır
+    if plan is not None and plan.get("estimated_seconds") is None:
+        plan = {**plan, "estimated_seconds": estimate_plan_seconds(plan)}
+    t0 = time.perf_counter()
+    # Gerçekleşen bellek yalnızca istenirse iş içinde izlenir; aksi halde süreç RSS tepe değeri raporlanır
+    with traced_peak_bytes(memory_tracing_enabled()) as measured:
+        if plan is not None and plan["output"] == "streaming":
+            end_prices, outputs, stats = run_streaming_monte_carlo_simulation(
+                start_price,
+                returns,
+                num_scenarios,
+                num_periods,
+                chunk_periods=plan["chunk_periods"],
+                dtype=plan["dtype"],
+                rng=rng,
+            )
+            analysis_results = analyze_simulation_results(end_prices, start_price)
+            # Akışlı modda yalnızca bitiş ufku vardır
+            for row in analysis_results["tail_risk"]:
+                row["horizon"] = int(num_periods)
+            run_summary = summarize_simulation(outputs["bands"], end_prices, outputs["sample_paths"])
+        else:
+            price_paths, stats = run_monte_carlo_simulation(
+                start_price,
+                returns,
+                num_scenarios,
+                num_periods,
+                engine=plan["engine"] if plan else "auto",
+                dtype=plan["dtype"] if plan else "float64",
+                rng=rng,
+            )
+            horizons = sorted({h for h in (num_periods // 4, num_periods // 2, 3 * num_periods // 4, num_periods) if h > 0})
+            analysis_results = analyze_simulation_results(price_paths, start_price, horizons=horizons)
+            # Tam fiyat yolu matrisi yerine kompakt özet saklanır
+            run_summary = summarize_price_paths(price_paths)
+            del price_paths
+
+    analysis_results["historical_mean_return"] = stats["mean_return"]
+    analysis_results["historical_volatility"] = stats["volatility"]
+    analysis_results["median_max_drawdown_pct"] = stats["median_max_drawdown_pct"]
+    # Aynı getirilerin log-normal kapalı form karşılığı (çapraz kontrol)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_returns = np.log1p(returns.to_numpy(dtype=float))
+    log_returns = log_returns[np.isfinite(log_returns)]
+    if len(log_returns) > 1:
+        analysis_results["analytic_tail_risk"] = lognormal_tail_risk(
+            start_price, float(np.mean(log_returns)), float(np.std(log_returns, ddof=1)), num_periods
+        )
+    analysis_results["simulation_engine"] = stats["engine"]
+    analysis_results["frequency"] = frequency
+    analysis_results["num_scenarios"] = int(num_scenarios)
+    analysis_results["num_periods"] = int(num_periods)
+    analysis_results["run_summary"] = run_summary
+    if plan is not None:
+        analysis_results["plan"] = plan
+        analysis_results["actual_seconds"] = time.perf_counter() - t0
+        analysis_results["actual_bytes"] = measured["bytes"]
+        analysis_results["actual_bytes_exclusive"] = measured["exclusive"]
+        analysis_results["process_peak_rss_bytes"] = process_peak_rss_bytes()
+
+    return analysis_results
+
+
+def preview_tail_risk(params: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """Tam simülasyon sürerken gösterilecek kapalı form (log-normal) VaR/CVaR önizlemesi"""
+    if params.get("ticker_col"):
+        return None
+    try:
+        entry = get_returns_index(params["date_col"], params["price_col"])["frequencies"][params.get("frequency", "native")]
+        stats = entry["stats"]
+        return lognormal_tail_risk(
+            params["start_price"], stats["mean_log_return"], stats["log_volatility"], int(params["num_periods"])
+        )
+    except Exception:
+        return None
+
+
+def _simulate_multi_ticker(
+    df: pd.DataFrame,
     date_col: str,
+    ticker_col: str,
     price_col: str,
-    start_price: float,
     num_periods: int,
     num_scenarios: int,
-    header_row_index: Optional[int] = None,
+    rank_by: str = "cvar_95_return_pct",
+    max_block_elements: int = 10_000_000,
 ) -> Dict[str, Any]:
-    """Monte Carlo simülasyonunu çalıştırır ve analiz sonuçlarını döndürür"""
+    """Çok sembollü toplu simülasyon ve sıralama (oturum durumuna dokunmaz, havuz işçisinde çalışabilir)"""
+    returns, last_prices = calculate_returns_by_ticker(df, date_col, ticker_col, price_col)
+
+    # Simüle edilemeyen sembolleri ayır (yetersiz veri, sabit fiyat)
+    volatilities = returns.std()
+    valid = (returns.count() >= 2) & (volatilities > 0) & (last_prices.reindex(returns.columns) > 0)
+    skipped = [str(t) for t in returns.columns[~valid.to_numpy()]]
+    returns = returns.loc[:, valid.to_numpy()]
+    if returns.shape[1] == 0:
+        raise ValueError("Simüle edilebilecek sembol bulunamadı.")
+
+    tickers = list(returns.columns)
+    start_prices = last_prices.reindex(tickers).to_numpy(dtype=float)
+
+    end_prices, stats = run_batched_monte_carlo_simulation(
+        start_prices, returns, num_scenarios, num_periods,
+        max_block_elements=max_block_elements, rng=np.random.default_rng(),
+    )
+
+    ranking = analyze_batched_results(end_prices, start_prices, tickers, rank_by=rank_by)
+    historical = pd.DataFrame({
+        "ticker": tickers,
+        "historical_mean_return": stats["mean_return"],
+        "historical_volatility": stats["volatility"],
+    })
+    ranking = ranking.merge(historical, on="ticker", how="left")
+
+    return {
+        "ranking": ranking,
+        "num_tickers": len(tickers),
+        "skipped_tickers": skipped,
+        "rank_by": rank_by,
+        "num_scenarios": int(num_scenarios),
+        "num_periods": int(num_periods),
+    }
+
+
+def _fit_scenarios_to_budget(num_scenarios: int, estimate_fn: Callable[[int], int], budget_bytes: int) -> int:
+    """Tahmini bellek bütçeyi aşıyorsa senaryo sayısını küçültür; en düşük sınıra da sığmıyorsa hata verir"""
+    fitted = int(num_scenarios)
+    while estimate_fn(fitted) > budget_bytes:
+        scaled = int(fitted * budget_bytes / estimate_fn(fitted))
+        fitted = min(fitted - 1, (scaled // MIN_SCENARIOS) * MIN_SCENARIOS)
+        if fitted < MIN_SCENARIOS:
+            raise ValueError(
+                f"Simülasyon {MIN_SCENARIOS} senaryoda bile bellek bütçesine "
+                f"({budget_bytes / 1024 ** 2:.0f} MB) sığmıyor. Periyot sayısını azaltın."
+            )
+    return fitted
+
+
+def submit_simulation_analysis(params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Simülasyonu paylaşılan havuza gönderir.
+
+    Returns:
+        dict: İş tutamacı ("job"), kullanılan senaryo sayısı ve varsa küçültme bilgisi ya da "error"
+    """
     try:
-        if header_row_index is not None and "uploaded_file" in st.session_state:
-            uploaded_file = st.session_state.uploaded_file
-            uploaded_file.seek(0)
-
-            if uploaded_file.name.lower().endswith('.csv'):
-                df = pd.read_csv(uploaded_file, header=header_row_index, engine="python")
-            else:
-                df = pd.read_excel(
-                    uploaded_file,
-                    header=header_row_index,
-                    engine="openpyxl" if uploaded_file.name.lower().endswith('.xlsx') else None,
-                )
-
-            df = df.dropna(how='all')
-            st.session_state.dataframe = df
+        _reload_with_header(params.get("header_row_index"))
 
         if "dataframe" not in st.session_state or st.session_state.dataframe is None:
             return {"error": "Analiz için veri bulunamadı. Lütfen önce bir dosya yükleyin."}
 
         df = st.session_state.dataframe
+        pool = get_simulation_pool()
+        num_periods = int(params["num_periods"])
+        requested = int(params["num_scenarios"])
+        plan: Optional[Dict[str, Any]] = None
+        # Tek ve çok sembollü işler aynı iş başına bütçeyle sınırlanır
+        job_budget = get_job_memory_budget(pool.memory_budget_bytes, pool.max_workers)
+
+        if params.get("ticker_col"):
+            num_tickers = max(1, int(df[params["ticker_col"]].nunique()))
+            # 3B blok, en düşük senaryo sayısı bütçeye sığacak şekilde küçültülür
+            max_block_elements = 10_000_000
+            while (
+                estimate_batched_simulation_bytes(num_periods, MIN_SCENARIOS, num_tickers, max_block_elements) > job_budget
+                and max_block_elements > num_periods * num_tickers
+            ):
+                max_block_elements //= 2
+            estimate_fn = lambda n: estimate_batched_simulation_bytes(num_periods, n, num_tickers, max_block_elements)
+            num_scenarios = _fit_scenarios_to_budget(requested, estimate_fn, job_budget)
+            job = pool.submit(
+                get_session_id(),
+                _simulate_multi_ticker,
+                df,
+                params["date_col"],
+                params["ticker_col"],
+                params["price_col"],
+                num_periods,
+                num_scenarios,
+                rank_by=params.get("rank_by", "cvar_95_return_pct"),
+                max_block_elements=max_block_elements,
+                estimated_bytes=estimate_fn(num_scenarios),
+            )
+        else:
+            # Planlayıcı hassasiyet, blok boyutu ve motoru iş başına bütçeye göre seçer
+            estimate_fn = lambda n: minimum_plan_bytes(num_periods, n)
+            num_scenarios = _fit_scenarios_to_budget(requested, estimate_fn, job_budget)
+            plan = plan_simulation(num_periods, num_scenarios, job_budget, concurrent_jobs=pool.max_workers)
+            frequency = params.get("frequency", "native")
+            returns = select_returns(get_returns_index(params["date_col"], params["price_col"]), frequency)
+            job = pool.submit(
+                get_session_id(),
+                _simulate_single,
+                returns,
+                params["start_price"],
+                num_periods,
+                num_scenarios,
+                plan=plan,
+                frequency=frequency,
+                estimated_bytes=plan["estimated_bytes"],
+            )
+
+        return {
+            "job": job,
+            "plan": plan,
+            "preview": preview_tail_risk(params),
+            "num_scenarios": num_scenarios,
+            "downscaled_from": requested if num_scenarios != requested else None,
+        }
+    except Exception as e:
+        return {"error": f"Simülasyon başlatılamadı: {e}"}
+
+
+def collect_simulation_result(submission: Dict[str, Any]) -> Dict[str, Any]:
+    """Biten havuz işinin sonucunu alır; sonuç özetini oturuma taşır"""
+    job: SimulationJob = submission["job"]
+    try:
+        response = job.result()
+    except Exception as e:
+        return {"error": f"Simülasyon sırasında bir hata oluştu: {e}"}
+
+    response = dict(response)
+    if "run_summary" in response:
+        st.session_state.run_summary = response.pop("run_summary")
+    if submission.get("downscaled_from"):
+        response["downscaled_from"] = submission["downscaled_from"]
+    return response
+
+
+def submit_backtest_analysis(
+    date_col: str,
+    price_col: str,
+    window: int = 250,
+    expanding: bool = False,
+    engine: str = "monte_carlo",
+    num_scenarios: int = 2000,
+) -> Dict[str, Any]:
+    """
+    VaR/CVaR geriye dönük testini paylaşılan havuza gönderir.
+    Blok boyutu, tahmini bellek iş başına bütçeye sığacak şekilde küçültülür.
+
+    Returns:
+        dict: İş tutamacı ("job") ve tahmini bellek ya da "error"
+    """
+    try:
+        if "dataframe" not in st.session_state or st.session_state.dataframe is None:
+            return {"error": "Analiz için veri bulunamadı. Lütfen önce bir dosya yükleyin."}
 
-        returns = calculate_returns(df, date_col, price_col)
+        returns = select_returns(get_returns_index(date_col, price_col))
+        pool = get_simulation_pool()
+        job_budget = get_job_memory_budget(pool.memory_budget_bytes, pool.max_workers)
 
-        price_paths, stats = run_monte_carlo_simulation(
-            start_price, returns, num_scenarios, num_periods
+        max_block_elements = 20_000_000
+        estimate_fn = lambda block: estimate_backtest_bytes(
+            len(returns), window, expanding, engine, num_scenarios, block
         )
+        while estimate_fn(max_block_elements) > job_budget and max_block_elements > 1:
+            max_block_elements //= 2
 
-        analysis_results = analyze_simulation_results(price_paths, start_price)
+        estimated_bytes = estimate_fn(max_block_elements)
+        job = pool.submit(
+            get_session_id(),
+            run_var_backtest,
+            returns,
+            window=window,
+            expanding=expanding,
+            engine=engine,
+            num_scenarios=num_scenarios,
+            max_block_elements=max_block_elements,
+            rng=np.random.default_rng(),
+            estimated_bytes=estimated_bytes,
+        )
+        return {"job": job, "estimated_bytes": estimated_bytes}
+    except Exception as e:
+        return {"error": f"Geriye dönük test başlatılamadı: {e}"}
 
-        analysis_results["historical_mean_return"] = stats["mean_return"]
-        analysis_results["historical_volatility"] = stats["volatility"]
-        analysis_results["num_scenarios"] = int(num_scenarios)
-        analysis_results["num_periods"] = int(num_periods)
 
-        st.session_state.price_paths = price_paths
+def collect_backtest_result(submission: Dict[str, Any]) -> Dict[str, Any]:
+    """Biten geriye dönük test işinin sonucunu alır"""
+    try:
+        return submission["job"].result()
+    except Exception as e:
+        return {"error": f"Geriye dönük test sırasında bir hata oluştu: {e}"}
+
 
-        return analysis_results
+def save_current_run() -> Dict[str, Any]:
+    """Oturumdaki sonuçları kompakt çalışma dosyası olarak kaydeder"""
+    try:
+        if st.session_state.get("run_summary") is None or not st.session_state.get("analysis_results"):
+            return {"error": "Kaydedilecek analiz sonucu bulunamadı."}
+        run_id = save_run(
+            st.session_state.run_params,
+            st.session_state.analysis_results,
+            st.session_state.run_summary,
+        )
+        return {"run_id": run_id}
     except Exception as e:
-        return {"error": f"Simülasyon sırasında bir hata oluştu: {e}"}
+        return {"error": f"Çalışma kaydedilemedi: {e}"}
 
 
+def load_saved_run(run_id: str) -> Dict[str, Any]:
+    """Kayıtlı çalışmayı yeniden simülasyon yapmadan sonuç ekranına yükler"""
+    try:
+        run = load_run(run_id)
+    except Exception as e:
+        return {"error": f"Çalışma yüklenemedi: {e}"}
+
+    st.session_state.run_params = run["params"]
+    st.session_state.analysis_results = run["metrics"]
+    st.session_state.run_summary = run["summary"]
+    st.session_state.loaded_run_id = run["run_id"]
+    # Yüklenen çalışmanın ham verisi yoktur; önceki dosya ile karışmasın
+    st.session_state.dataframe = None
+    return {"run_id": run["run_id"]}
+
+
+def list_saved_runs() -> List[Dict[str, Any]]:
+    """Kayıtlı çalışmaların listesi"""
+    try:
+        return list_runs()
+    except Exception:
+        return []
+
+
+def load_runs_for_comparison(run_ids: List[str]) -> Dict[str, Any]:
+    """Karşılaştırma için birden fazla kayıtlı çalışmayı yükler"""
+    try:
+        return {"runs": [load_run(run_id) for run_id in run_ids]}
+    except Exception as e:
+        return {"error": f"Çalışmalar yüklenemedi: {e}"}
@@ -0,0 +1,248 @@
+import math
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.tail_risk import tail_risk_of_rows
+
+
+BACKTEST_ENGINES = ["monte_carlo", "historical"]
+
+
+def _window_bounds(num_obs: int, window: int, expanding: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """Her tahmin adımı için kullanılan geçmiş pencerenin [başlangıç, bitiş) sınırlarını döndürür"""
+    ends = np.arange(window, num_obs)
+    starts = np.zeros_like(ends) if expanding else ends - window
+    return starts, ends
+
+
+def _window_moments(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Kümülatif toplamlarla tüm pencerelerin ortalama ve standart sapmasını tek seferde hesaplar"""
+    # Sayısal kararlılık için önce genel ortalama çıkarılır
+    shift = values.mean()
+    centered = values - shift
+    csum = np.concatenate(([0.0], np.cumsum(centered)))
+    csum_sq = np.concatenate(([0.0], np.cumsum(centered * centered)))
+
+    counts = (ends - starts).astype(float)
+    sums = csum[ends] - csum[starts]
+    sums_sq = csum_sq[ends] - csum_sq[starts]
+
+    means = sums / counts
+    variances = (sums_sq - sums * means) / (counts - 1.0)
+    return means + shift, np.sqrt(np.maximum(variances, 0.0))
+
+
+def _monte_carlo_forecasts(
+    means: np.ndarray,
+    stds: np.ndarray,
+    num_scenarios: int,
+    confidence: float,
+    max_block_elements: int,
+    rng: np.random.Generator,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Tüm pencereler için bir sonraki periyot dağılımını toplu simüle eder (pencere x senaryo)"""
+    num_windows = len(means)
+    var = np.empty(num_windows)
+    cvar = np.empty(num_windows)
+    block = max(1, int(max_block_elements // max(1, num_scenarios)))
+
+    for start in range(0, num_windows, block):
+        stop = min(start + block, num_windows)
+        shocks = rng.standard_normal((stop - start, num_scenarios))
+        shocks *= stds[start:stop, None]
+        shocks += means[start:stop, None]
+        # Fiyat sıfırın altına inemez: getiri en az -%100
+        np.maximum(shocks, -1.0, out=shocks)
+        var[start:stop], cvar[start:stop] = tail_risk_of_rows(shocks, confidence)
+
+    return var, cvar
+
+
+def _historical_forecasts(
+    values: np.ndarray,
+    starts: np.ndarray,
+    ends: np.ndarray,
+    confidence: float,
+    max_block_elements: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Tarihsel simülasyon: her pencerenin ampirik dağılımından VaR/CVaR hesaplar"""
+    num_windows = len(ends)
+    var = np.empty(num_windows)
+    cvar = np.empty(num_windows)
+    counts = ends - starts
+    width = int(counts.max())
+    # Kayan pencerelerin uzunluğu eşittir; yalnızca genişleyen pencereler dolgu içerir
+    ragged = bool(counts.min() != width)
+    block = max(1, int(max_block_elements // max(1, width)))
+    offsets = np.arange(width)
+
+    for start in range(0, num_windows, block):
+        stop = min(start + block, num_windows)
+        idx = starts[start:stop, None] + offsets[None, :]
+        if ragged:
+            # Farklı uzunluktaki pencereler tek matriste toplanır; dolgu (+inf) satır sonuna yazılır
+            padding = idx >= ends[start:stop, None]
+            np.minimum(idx, len(values) - 1, out=idx)
+            samples = values[idx]
+            del idx
+            samples[padding] = np.inf
+            del padding
+            var[start:stop], cvar[start:stop] = tail_risk_of_rows(samples, confidence, counts[start:stop])
+        else:
+            samples = values[idx]
+            del idx
+            var[start:stop], cvar[start:stop] = tail_risk_of_rows(samples, confidence)
+
+    return var, cvar
+
+
+def estimate_backtest_bytes(
+    num_obs: int,
+    window: int,
+    expanding: bool = False,
+    engine: str = "monte_carlo",
+    num_scenarios: int = 2000,
+    max_block_elements: int = 20_000_000,
+) -> int:
+    """Geriye dönük testin tepe bellek kullanımını tahmin eder (blok matrisleri + pencere vektörleri)"""
+    num_windows = max(1, num_obs - window)
+    if engine == "monte_carlo":
+        width = num_scenarios
+        # Şok matrisi (yerinde partition) ve kuyruk maskesi
+        per_element = 8 + 1
+    else:
+        width = num_obs - 1 if expanding else window
+        # İndeks ve örnek matrisleri + dolgu/kuyruk maskesi (sıralama yerinde)
+        per_element = 2 * 8 + 1
+    rows = min(num_windows, max(1, int(max_block_elements // max(1, width))))
+    vectors = 8 * (num_obs + 8 * num_windows)
+    return int(rows * width * per_element + vectors)
+
+
+def _chi2_sf(statistic: float, dof: int) -> float:
+    """Ki-kare dağılımı sağ kuyruk olasılığı (1 ve 2 serbestlik derecesi için kapalı form)"""
+    statistic = max(float(statistic), 0.0)
+    if dof == 1:
+        return math.erfc(math.sqrt(statistic / 2.0))
+    if dof == 2:
+        return math.exp(-statistic / 2.0)
+    raise ValueError("Yalnızca 1 ve 2 serbestlik derecesi desteklenir.")
+
+
+def _bernoulli_log_likelihood(successes: float, failures: float, prob: float) -> float:
+    """0 * log(0) = 0 kuralıyla Bernoulli log-olabilirliği"""
+    ll = 0.0
+    if successes > 0:
+        ll += successes * math.log(prob)
+    if failures > 0:
+        ll += failures * math.log(1.0 - prob)
+    return ll
+
+
+def kupiec_pof_test(num_exceptions: int, num_observations: int, confidence: float = 0.95) -> Dict[str, float]:
+    """Kupiec POF (proportion of failures) testi: istisna oranı beklenen oranla uyumlu mu?"""
+    expected = 1.0 - confidence
+    observed = num_exceptions / num_observations
+    ll_null = _bernoulli_log_likelihood(num_exceptions, num_observations - num_exceptions, expected)
+    ll_alt = _bernoulli_log_likelihood(num_exceptions, num_observations - num_exceptions, observed)
+    lr = -2.0 * (ll_null - ll_alt)
+    return {"lr_statistic": float(lr), "p_value": _chi2_sf(lr, 1)}
+
+
+def christoffersen_independence_test(exceptions: np.ndarray) -> Dict[str, float]:
+    """Christoffersen bağımsızlık testi: istisnalar kümeleniyor mu?"""
+    hits = np.asarray(exceptions, dtype=bool)
+    prev, curr = hits[:-1], hits[1:]
+    n00 = int(np.sum(~prev & ~curr))
+    n01 = int(np.sum(~prev & curr))
+    n10 = int(np.sum(prev & ~curr))
+    n11 = int(np.sum(prev & curr))
+
+    pi0 = n01 / (n00 + n01) if (n00 + n01) else 0.0
+    pi1 = n11 / (n10 + n11) if (n10 + n11) else 0.0
+    pi = (n01 + n11) / max(n00 + n01 + n10 + n11, 1)
+
+    ll_null = _bernoulli_log_likelihood(n01 + n11, n00 + n10, pi)
+    ll_alt = _bernoulli_log_likelihood(n01, n00, pi0) + _bernoulli_log_likelihood(n11, n10, pi1)
+    lr = -2.0 * (ll_null - ll_alt)
+    return {
+        "lr_statistic": float(lr),
+        "p_value": _chi2_sf(lr, 1),
+        "n00": n00,
+        "n01": n01,
+        "n10": n10,
+        "n11": n11,
+    }
+
+
+def run_var_backtest(
+    returns: pd.Series,
+    window: int = 250,
+    expanding: bool = False,
+    engine: str = "monte_carlo",
+    num_scenarios: int = 2000,
+    confidence: float = 0.95,
+    max_block_elements: int = 20_000_000,
+    rng: Optional[np.random.Generator] = None,
+) -> Dict[str, Any]:
+    """
+    Tarihi getiriler üzerinde kayan (veya genişleyen) pencereyle VaR/CVaR geriye dönük testi yapar.
+    Tüm pencereler tek bir vektörel hesaplamada (bloklar halinde) simüle edilir.
+
+    Returns:
+        dict: Tahmin tablosu, istisna oranı, Kupiec POF ve Christoffersen testleri
+    """
+    if engine not in BACKTEST_ENGINES:
+        raise ValueError(f"Bilinmeyen motor: {engine}. Seçenekler: {', '.join(BACKTEST_ENGINES)}")
+    if not 0.0 < confidence < 1.0:
+        raise ValueError("Güven düzeyi 0 ile 1 arasında olmalıdır.")
+
+    clean = returns.dropna()
+    values = clean.to_numpy(dtype=float)
+    if window < 2 or len(values) <= window:
+        raise ValueError(
+            f"Geriye dönük test için yetersiz veri: {len(values)} getiri, pencere {window}."
+        )
+
+    starts, ends = _window_bounds(len(values), window, expanding)
+
+    if engine == "monte_carlo":
+        means, stds = _window_moments(values, starts, ends)
+        rng = rng if rng is not None else np.random.default_rng()
+        var, cvar = _monte_carlo_forecasts(means, stds, num_scenarios, confidence, max_block_elements, rng)
+    else:
+        var, cvar = _historical_forecasts(values, starts, ends, confidence, max_block_elements)
+
+    realized = values[ends]
+    exceptions = realized < var
+
+    num_observations = int(len(realized))
+    num_exceptions = int(exceptions.sum())
+    kupiec = kupiec_pof_test(num_exceptions, num_observations, confidence)
+    christoffersen = christoffersen_independence_test(exceptions)
+    cc_statistic = kupiec["lr_statistic"] + christoffersen["lr_statistic"]
+
+    forecasts = pd.DataFrame({
+        "date": clean.index[ends],
+        "realized_return": realized,
+        "var_return": var,
+        "cvar_return": cvar,
+        "exception": exceptions,
+    })
+
+    return {
+        "forecasts": forecasts,
+        "engine": engine,
+        "window": int(window),
+        "expanding": bool(expanding),
+        "confidence": float(confidence),
+        "num_observations": num_observations,
+        "num_exceptions": num_exceptions,
+        "exception_rate_pct": num_exceptions / num_observations * 100.0,
+        "expected_rate_pct": (1.0 - confidence) * 100.0,
+        "kupiec": kupiec,
+        "christoffersen": christoffersen,
+        "conditional_coverage": {"lr_statistic": float(cc_statistic), "p_value": _chi2_sf(cc_statistic, 2)},
+    }
@@ -1,58 +1,222 @@
-import io
+import re
+import warnings
 from typing import Dict, Any, List, Optional
 
+import numpy as np
 import pandas as pd
 
 
+DATE_KEYWORDS = ["date", "tarih", "gün", "gun"]
+HEADER_PRICE_KEYWORDS = [
+    "price", "fiyat", "close", "kapanış", "kapanis", "open", "high", "low",
+    "bist", "kchol", "froto", "tuprs", "toaso", "ge", "intel", "microsoft"
+]
+PRICE_KEYWORDS = HEADER_PRICE_KEYWORDS + ["getiri"]
+# Dosya önizlemesinde gösterilen en fazla sütun (geniş tablolarda ortası "..." ile kısaltılır)
+PREVIEW_MAX_COLUMNS = 40
+
+
+def _keyword_regex(keywords: List[str]) -> "re.Pattern[str]":
+    """Anahtar kelimeleri tek bir birleşik regex'e derler"""
+    return re.compile("|".join(re.escape(k) for k in keywords))
+
+
+_DATE_RE = _keyword_regex(DATE_KEYWORDS)
+_HEADER_PRICE_RE = _keyword_regex(HEADER_PRICE_KEYWORDS)
+_PRICE_RE = _keyword_regex(PRICE_KEYWORDS)
+_SEPARATOR_RE = re.compile(r"[ /\-_]")
+# Tarihe benzeyen metin: ayırıcıyla (-, /, .) bölünmüş üç rakam grubu (2024-01-31, 31.01.2024, 1/31/24)
+_DATE_SHAPE_RE = re.compile(r"^\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}")
+
+
 def find_header_row(df_preview: pd.DataFrame) -> int:
     """
     DataFrame'in ilk 20 satırını analiz ederek başlık satırını bulur.
-    Tarih ve fiyat anahtar kelimelerine göre skorlama yapar.
+    Tarih ve fiyat anahtar kelimelerine göre skorlama yapar; tüm hücreler tek seferde vektörel taranır.
     """
-    header_candidate = 0
-    best_score = -1
+    if df_preview.empty:
+        return 0
 
-    for i, row in df_preview.iterrows():
-        row_values = [str(val).strip().lower() for val in row.values]
+    n_rows, n_cols = df_preview.shape
+    values = df_preview.to_numpy(dtype=object).ravel()
+    # Eksik hücreler pandas sürümünden bağımsız olarak boş metin sayılır
+    missing = pd.isna(values)
+    cells = pd.Series(np.where(missing, "", values)).astype(str).str.strip().str.lower()
 
-        # Boş satırları atla
-        if all((val == "nan" or val == "") for val in row_values):
-            continue
+    def _row_any(mask: pd.Series) -> np.ndarray:
+        return mask.fillna(False).to_numpy(dtype=bool).reshape(n_rows, n_cols).any(axis=1)
 
-        # Tarih anahtar kelimelerini kontrol et
-        has_date = any(
-            any(k in val for k in ["date", "tarih", "gün", "gun"]) for val in row_values
-        )
-        # Fiyat anahtar kelimelerini kontrol et
-        has_price = any(
-            any(k in val for k in [
-                "price", "fiyat", "close", "kapanış", "kapanis", "open", "high", "low",
-                "bist", "kchol", "froto", "tuprs", "toaso", "ge", "intel", "microsoft"
-            ]) for val in row_values
-        )
-        # Ayırıcı karakterler (space, /, -, _) kontrolü
-        has_word_like = any(any(sep in val for sep in [" ", "/", "-", "_"]) for val in row_values)
+    # Boş satırları atla
+    is_empty = (missing | cells.isin(["nan", ""]).to_numpy()).reshape(n_rows, n_cols).all(axis=1)
+
+    has_date = _row_any(cells.str.contains(_DATE_RE, na=False))
+    has_price = _row_any(cells.str.contains(_HEADER_PRICE_RE, na=False))
+    # Ayırıcı karakterler (space, /, -, _) kontrolü
+    has_word_like = _row_any(cells.str.contains(_SEPARATOR_RE, na=False))
+    # Uzun stringlerden kaçın
+    has_long = _row_any(cells.str.len() > 60)
+
+    # Skorlama sistemi
+    scores = 2 * has_date.astype(int) + 2 * has_price.astype(int) + has_word_like.astype(int) - has_long.astype(int)
+
+    # Hem tarih hem fiyat içeren ilk satır doğrudan başlıktır
+    both = ~is_empty & has_date & has_price
+    if both.any():
+        return int(df_preview.index[int(np.argmax(both))])
+
+    eligible = ~is_empty & (scores > -1)
+    if not eligible.any():
+        return 0
+    best = int(np.argmax(np.where(eligible, scores, -np.inf)))
+    return int(df_preview.index[best])
+
+
+def profile_columns(df: pd.DataFrame, sample_size: int = 500) -> pd.DataFrame:
+    """
+    Örneklem üzerinden her sütun için tek geçişte profil çıkarır.
+
+    Returns:
+        DataFrame: Sütun başına sayısal oran, tarih oranı, monotonluk, boşluk oranı ve isim eşleşmeleri
+    """
+    n_cols = df.shape[1]
+    names = pd.Series([str(c).lower() for c in df.columns])
+
+    # Sıralamayı korumak için eşit aralıklı örneklem
+    step = max(1, int(np.ceil(len(df) / sample_size))) if sample_size > 0 else 1
+    sample = df.iloc[::step]
+    n = len(sample)
+
+    not_null = sample.notna().to_numpy()
+    non_null_count = not_null.sum(axis=0)
+    safe_count = np.maximum(non_null_count, 1)
+
+    dtypes = sample.dtypes
+    is_numeric_dtype = np.array([pd.api.types.is_numeric_dtype(t) and not pd.api.types.is_bool_dtype(t) for t in dtypes])
+    is_datetime_dtype = np.array([pd.api.types.is_datetime64_any_dtype(t) for t in dtypes])
+    is_object = ~is_numeric_dtype & ~is_datetime_dtype
 
-        # Skorlama sistemi
-        score = 0
-        if has_date:
-            score += 2
-        if has_price:
-            score += 2
-        if has_word_like:
-            score += 1
-        # Uzun stringlerden kaçın
-        if any(len(val) > 60 for val in row_values):
-            score -= 1
+    values = np.full((n, n_cols), np.nan)
+    if is_numeric_dtype.any():
+        values[:, is_numeric_dtype] = sample.iloc[:, is_numeric_dtype].to_numpy(dtype=float)
 
-        if score > best_score:
-            best_score = score
-            header_candidate = i
+    # Metin sütunlarını tek çağrıda sayıya çevir; aynı geçişte tarih biçimine benzeyen hücreler işaretlenir
+    date_shaped = np.zeros(n_cols)
+    if is_object.any() and n:
+        obj_block = sample.iloc[:, is_object].to_numpy(dtype=object)
+        # Metin işlemleri yalnızca tekil değerlerde yapılır (boş hücrelerin kodu -1)
+        codes, uniques = pd.factorize(obj_block.ravel())
+        text = pd.Series(uniques, dtype=object).astype(str).str.strip()
+        unique_numbers = np.append(pd.to_numeric(text, errors="coerce").to_numpy(dtype=float), np.nan)
+        unique_shaped = np.append(text.str.match(_DATE_SHAPE_RE).to_numpy(dtype=bool), False)
+        values[:, is_object] = unique_numbers[codes].reshape(obj_block.shape)
+        shaped = unique_shaped[codes].reshape(obj_block.shape)
+        date_shaped[is_object] = shaped.sum(axis=0) / safe_count[is_object]
 
-        if has_date and has_price:
-            return i
+    numeric_ratio = np.where(is_datetime_dtype, 0.0, np.isfinite(values).sum(axis=0) / safe_count)
 
-    return header_candidate
+    # Tarih ayrıştırması yalnızca tarih tipli ve çoğunlukla tarih biçimli metin sütunlarında yapılır
+    date_ratio = is_datetime_dtype.astype(float)
+    date_values = np.full((n, n_cols), np.nan)
+    for j in np.flatnonzero(is_datetime_dtype | (is_object & (numeric_ratio < 0.5) & (date_shaped >= 0.5))):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            parsed_dates = pd.to_datetime(sample.iloc[:, j], errors="coerce")
+        valid = parsed_dates.notna().to_numpy()
+        date_ratio[j] = valid.sum() / safe_count[j]
+        date_values[valid, j] = parsed_dates[valid].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+
+    # Monotonluk: ardışık (boş olmayan) farkların tek yönlü oranı
+    mono_source = np.where((date_ratio >= 0.5)[None, :], date_values, values)
+    # Boşluklar sütun bazında ileri doldurulur; her değer bir önceki boş olmayan değerle karşılaştırılır
+    present = np.isfinite(mono_source)
+    last_present = np.where(present, np.arange(n)[:, None], 0)
+    np.maximum.accumulate(last_present, axis=0, out=last_present)
+    filled = np.take_along_axis(mono_source, last_present, axis=0)
+    diffs = np.diff(filled, axis=0)
+    valid_diffs = np.isfinite(diffs) & present[1:]
+    n_diffs = np.maximum(valid_diffs.sum(axis=0), 1)
+    increasing = ((diffs >= 0) & valid_diffs).sum(axis=0) / n_diffs
+    decreasing = ((diffs <= 0) & valid_diffs).sum(axis=0) / n_diffs
+    monotonic_ratio = np.where(valid_diffs.any(axis=0), np.maximum(increasing, decreasing), 0.0)
+
+    return pd.DataFrame({
+        "column": list(df.columns),
+        "is_unnamed": names.str.contains("unnamed", regex=False).to_numpy(),
+        "name_date_match": names.str.contains(_DATE_RE).to_numpy(),
+        "name_price_match": names.str.contains(_PRICE_RE).to_numpy(),
+        "numeric_ratio": numeric_ratio,
+        "date_ratio": date_ratio,
+        "monotonic_ratio": monotonic_ratio,
+        "null_ratio": 1.0 - non_null_count / max(n, 1),
+    })
+
+
+def rank_date_candidates(profile: pd.DataFrame) -> List[Any]:
+    """Profil skoruna göre tarih sütunu adaylarını sıralar"""
+    candidates = profile[~profile["is_unnamed"] & (profile["name_date_match"] | (profile["date_ratio"] >= 0.5))]
+    score = (
+        3.0 * candidates["date_ratio"]
+        + 2.0 * candidates["name_date_match"]
+        + candidates["monotonic_ratio"]
+        - candidates["null_ratio"]
+    )
+    order = score.sort_values(ascending=False, kind="mergesort").index
+    return list(candidates.loc[order, "column"])
+
+
+def rank_price_candidates(profile: pd.DataFrame, exclude: List[Any]) -> List[Any]:
+    """Profil skoruna göre fiyat sütunu adaylarını sıralar"""
+    candidates = profile[
+        ~profile["is_unnamed"]
+        & ~profile["column"].isin(exclude)
+        & (profile["name_price_match"] | (profile["numeric_ratio"] >= 0.8))
+    ]
+    score = (
+        2.0 * candidates["name_price_match"]
+        + 2.0 * candidates["numeric_ratio"]
+        - 2.0 * candidates["null_ratio"]
+        - candidates["date_ratio"]
+    )
+    order = score.sort_values(ascending=False, kind="mergesort").index
+    return list(candidates.loc[order, "column"])
+
+
+TICKER_KEYWORDS = ["ticker", "symbol", "sembol", "hisse", "kod", "code", "instrument", "enstrüman"]
+
+
+def detect_ticker_column(df: pd.DataFrame, date_col: Optional[str]) -> Optional[str]:
+    """
+    Uzun formatlı (tarih, sembol, fiyat) veride sembol sütununu bulur.
+    Tarih sütunu tekrar ediyorsa ve (tarih, sembol) çiftleri büyük ölçüde tekilse uzun format kabul edilir.
+    """
+    if date_col is None or date_col not in df.columns or len(df) < 2:
+        return None
+
+    dates = df[date_col]
+    # Geniş formatta her tarih bir kez görünür
+    if not dates.duplicated().any():
+        return None
+
+    candidates: List[str] = []
+    fallback: List[str] = []
+    for col in df.columns:
+        if col == date_col or 'unnamed' in str(col).lower():
+            continue
+        if pd.api.types.is_numeric_dtype(df[col]):
+            continue
+        n_unique = df[col].nunique(dropna=True)
+        if n_unique < 2 or n_unique > len(df) // 2:
+            continue
+        if any(k in str(col).lower() for k in TICKER_KEYWORDS):
+            candidates.append(col)
+        else:
+            fallback.append(col)
+
+    for col in candidates + fallback:
+        pairs = df[[date_col, col]].dropna()
+        if len(pairs) and pairs.duplicated().mean() < 0.05:
+            return col
+    return None
 
 
 def inspect_and_load_data(uploaded_file) -> Dict[str, Any]:
@@ -74,7 +238,7 @@ def inspect_and_load_data(uploaded_file) -> Dict[str, Any]:
         else:
             return {"error": "Desteklenmeyen dosya formatı. Lütfen CSV veya Excel kullanın."}
 
-        file_preview_str = preview_df.to_string()
+        file_preview_str = preview_df.to_string(max_cols=PREVIEW_MAX_COLUMNS)
         suggested_header_row = find_header_row(preview_df)
 
         # Tam dosyayı başlık satırıyla oku
@@ -89,41 +253,18 @@ def inspect_and_load_data(uploaded_file) -> Dict[str, Any]:
         df = df.dropna(how='all')
         cols: List[str] = list(df.columns)
 
-        # Tarih ve fiyat sütunlarını tespit et
-        suggested_date: Optional[str] = None
-        suggested_prices: List[str] = []
-
-        # Sütun analizi
-        for col in cols:
-            col_str = str(col).lower()
-            # İsimsiz sütunları atla
-            if 'unnamed' in col_str:
-                continue
-
-            # Tarih sütunu kontrolü
-            if any(k in col_str for k in ["date", "tarih", "gün", "gun"]):
-                if suggested_date is None:
-                    suggested_date = col
-
-            # Fiyat sütunu kontrolü
-            price_keywords = [
-                'price', 'fiyat', 'kapanış', 'kapanis', 'close', 'getiri',
-                'open', 'high', 'low', 'bist', 'kchol', 'froto', 'tuprs', 'toaso',
-                'ge', 'intel', 'microsoft'
-            ]
-            if any(keyword in col_str for keyword in price_keywords):
-                suggested_prices.append(col)
-            # Sayısal sütunları da fiyat olarak değerlendir
-            elif pd.api.types.is_numeric_dtype(df[col]):
-                if col != suggested_date:
-                    suggested_prices.append(col)
-
-        # Tarih sütununu fiyat listesinden çıkar
-        if suggested_date in suggested_prices:
-            suggested_prices = [c for c in suggested_prices if c != suggested_date]
-
-        # Tekrarları kaldır
-        suggested_prices = list(dict.fromkeys(suggested_prices))
+        # Sütun profili üzerinden tarih ve fiyat sütunlarını tespit et
+        profile = profile_columns(df)
+        date_candidates = rank_date_candidates(profile)
+        suggested_date: Optional[str] = date_candidates[0] if date_candidates else None
+        suggested_prices: List[str] = rank_price_candidates(
+            profile, exclude=[suggested_date] if suggested_date is not None else []
+        )
+
+        # Uzun format (tarih, sembol, fiyat) kontrolü
+        suggested_ticker = detect_ticker_column(df, suggested_date)
+        if suggested_ticker is not None:
+            suggested_prices = [c for c in suggested_prices if c != suggested_ticker]
 
         return {
             "dataframe": df,
@@ -131,6 +272,10 @@ def inspect_and_load_data(uploaded_file) -> Dict[str, Any]:
             "suggested_header_row": suggested_header_row,
             "suggested_date_col": suggested_date,
             "suggested_price_cols": suggested_prices,
+            "suggested_ticker_col": suggested_ticker,
+            "layout": "long" if suggested_ticker is not None else "wide",
+            "num_tickers": int(df[suggested_ticker].nunique()) if suggested_ticker is not None else None,
+            "column_profile": profile,
             "file_preview": file_preview_str,
             "error": None
         }
@@ -0,0 +1,245 @@
+import sys
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore
+
+
+_trace_lock = threading.Lock()
+_trace_users = 0
+# Başlatılan ölçüm sayısı; yalnızca artar, ölçüm penceresinde başka iş başladıysa değişmiş olur
+_trace_starts = 0
+
+
+def process_peak_rss_bytes() -> Optional[int]:
+    """Sürecin RSS tepe değeri (ucuz, süreç geneli; desteklenmeyen platformda None)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux'ta KB, macOS'ta bayt cinsindendir
+    return int(peak if sys.platform == "darwin" else peak * 1024)
+
+
+@contextmanager
+def traced_peak_bytes(enabled: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    Blok içindeki gerçek tepe bellek artışını tracemalloc ile ölçer (NumPy dizileri dahil).
+    İzleme süreç geneli olduğundan ve tüm Python kodunu yavaşlattığından yalnızca `enabled` ile açılır.
+    Ölçüm penceresinde başka bir ölçüm çalışıyorsa veya başladıysa sonuç "exclusive": False ile işaretlenir.
+    """
+    global _trace_users, _trace_starts
+    measurement: Dict[str, Any] = {"bytes": None, "exclusive": None}
+    if not enabled:
+        yield measurement
+        return
+
+    with _trace_lock:
+        if _trace_users == 0:
+            tracemalloc.start()
+        _trace_users += 1
+        _trace_starts += 1
+        starts_at_entry = _trace_starts
+        exclusive = _trace_users == 1
+        if exclusive:
+            tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+
+    measurement["exclusive"] = exclusive
+    try:
+        yield measurement
+    finally:
+        with _trace_lock:
+            peak = tracemalloc.get_traced_memory()[1]
+            measurement["bytes"] = max(0, int(peak - baseline))
+            measurement["exclusive"] = exclusive and _trace_starts == starts_at_entry
+            _trace_users -= 1
+            if _trace_users == 0:
+                tracemalloc.stop()
+
+
+class SimulationJob:
+    """Havuza gönderilen tek bir simülasyon işinin durumu ve sonucu"""
+
+    def __init__(self, pool: "SimulationWorkerPool", session_id: str, fn: Callable[..., Any],
+                 args: tuple, kwargs: Dict[str, Any], estimated_bytes: int) -> None:
+        self.session_id = session_id
+        self.estimated_bytes = int(estimated_bytes)
+        self.status = "queued"
+        self._pool = pool
+        self._fn = fn
+        self._args = args
+        self._kwargs = kwargs
+        self._queued_at = time.monotonic()
+        self._result: Any = None
+        self._error: Optional[BaseException] = None
+        self._finished = threading.Event()
+
+    def done(self) -> bool:
+        return self._finished.is_set()
+
+    def position(self) -> int:
+        """Kuyruktaki sıra (1 = sıradaki iş; çalışıyor veya bittiyse 0)"""
+        return self._pool.queue_position(self)
+
+    def cancel(self) -> bool:
+        """Henüz başlamamış işi kuyruktan çıkarır"""
+        return self._pool.cancel(self)
+
+    def result(self, timeout: Optional[float] = None) -> Any:
+        if not self._finished.wait(timeout):
+            raise TimeoutError("Simülasyon işi zaman aşımına uğradı.")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def _run(self) -> None:
+        try:
+            self._result = self._fn(*self._args, **self._kwargs)
+            self.status = "done"
+        except BaseException as e:
+            # Hata çağırana result() ile iletilir
+            self._error = e
+            self.status = "failed"
+        finally:
+            self._finished.set()
+
+
+class SimulationWorkerPool:
+    """
+    Süreç genelinde paylaşılan, sınırlı sayıda işçili simülasyon havuzu.
+
+    - Her oturumun kendi kuyruğu vardır; işler oturumlar arasında sırayla (round-robin) dağıtılır.
+    - Bir oturumun aynı anda en fazla `max_jobs_per_session` bekleyen/çalışan işi olabilir.
+    - Çalışan işlerin tahmini bellek toplamı `memory_budget_bytes` değerini aşamaz.
+    - Bütçeye sığmayan bir kuyruk başı `max_head_wait_seconds` süreden uzun beklerse, o iş başlayana kadar
+      başka iş dağıtılmaz; büyük işler küçük işlerin arkasında sonsuza dek beklemez.
+    """
+
+    def __init__(self, max_workers: int = 2, memory_budget_bytes: int = 2 * 1024 ** 3,
+                 max_jobs_per_session: int = 1, max_head_wait_seconds: float = 30.0) -> None:
+        if max_workers < 1:
+            raise ValueError("En az bir işçi gereklidir.")
+        self.max_workers = int(max_workers)
+        self.memory_budget_bytes = int(memory_budget_bytes)
+        self.max_jobs_per_session = int(max_jobs_per_session)
+        self.max_head_wait_seconds = float(max_head_wait_seconds)
+
+        self._cond = threading.Condition()
+        self._queues: "OrderedDict[str, Deque[SimulationJob]]" = OrderedDict()
+        self._running: List[SimulationJob] = []
+        self._reserved_bytes = 0
+
+        self._workers = [
+            threading.Thread(target=self._worker_loop, name=f"finsim-sim-{i}", daemon=True)
+            for i in range(self.max_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, session_id: str, fn: Callable[..., Any], *args: Any,
+               estimated_bytes: int = 0, **kwargs: Any) -> SimulationJob:
+        """İşi oturumun kuyruğuna ekler; bütçeyi tek başına aşan veya oturum limitini dolduran işler reddedilir"""
+        if estimated_bytes > self.memory_budget_bytes:
+            raise ValueError(
+                f"Tahmini bellek ({estimated_bytes / 1024 ** 2:.0f} MB) sunucu bütçesini "
+                f"({self.memory_budget_bytes / 1024 ** 2:.0f} MB) aşıyor."
+            )
+
+        job = SimulationJob(self, session_id, fn, args, kwargs, estimated_bytes)
+        with self._cond:
+            active = len(self._queues.get(session_id, ())) + sum(
+                1 for j in self._running if j.session_id == session_id
+            )
+            if active >= self.max_jobs_per_session:
+                raise ValueError("Bu oturum için zaten çalışan bir simülasyon var. Lütfen bitmesini bekleyin.")
+            self._queues.setdefault(session_id, deque()).append(job)
+            self._cond.notify_all()
+        return job
+
+    def cancel(self, job: SimulationJob) -> bool:
+        with self._cond:
+            queue = self._queues.get(job.session_id)
+            if queue is None or job not in queue:
+                return False
+            queue.remove(job)
+            if not queue:
+                del self._queues[job.session_id]
+            job.status = "cancelled"
+            job._error = RuntimeError("Simülasyon işi iptal edildi.")
+            job._finished.set()
+            self._cond.notify_all()
+            return True
+
+    def queue_position(self, job: SimulationJob) -> int:
+        with self._cond:
+            order = self._dispatch_order()
+            return order.index(job) + 1 if job in order else 0
+
+    def _overdue_head(self) -> Optional[SimulationJob]:
+        """Bekleme sınırını aşmış en eski kuyruk başı (kilit altında çağrılır)"""
+        deadline = time.monotonic() - self.max_head_wait_seconds
+        overdue = [q[0] for q in self._queues.values() if q[0]._queued_at <= deadline]
+        return min(overdue, key=lambda j: j._queued_at) if overdue else None
+
+    def _fits(self, job: SimulationJob) -> bool:
+        """İş şu an bellek bütçesine sığıyor mu (boş havuzda her iş sığar)"""
+        return not self._running or self._reserved_bytes + job.estimated_bytes <= self.memory_budget_bytes
+
+    def _dispatch_order(self) -> List[SimulationJob]:
+        """Bekleyen işlerin round-robin dağıtım sırası; süresi aşan kuyruk başı öne alınır (kilit altında çağrılır)"""
+        queues = [list(q) for q in self._queues.values()]
+        order: List[SimulationJob] = []
+        depth = 0
+        while any(depth < len(q) for q in queues):
+            order.extend(q[depth] for q in queues if depth < len(q))
+            depth += 1
+        overdue = self._overdue_head()
+        if overdue is not None:
+            order.remove(overdue)
+            order.insert(0, overdue)
+        return order
+
+    def _next_job(self) -> Optional[SimulationJob]:
+        """Bellek bütçesine sığan sıradaki işi seçer (kilit altında çağrılır)"""
+        overdue = self._overdue_head()
+        if overdue is not None:
+            # Uzun bekleyen iş sığana kadar diğer işler başlatılmaz; çalışanlar bitince bütçe boşalır
+            candidates = [overdue] if self._fits(overdue) else []
+        else:
+            candidates = [q[0] for q in self._queues.values() if self._fits(q[0])]
+        if not candidates:
+            return None
+
+        job = candidates[0]
+        queue = self._queues[job.session_id]
+        queue.popleft()
+        # Oturumu sıranın sonuna taşı (adil dağıtım)
+        del self._queues[job.session_id]
+        if queue:
+            self._queues[job.session_id] = queue
+        return job
+
+    def _worker_loop(self) -> None:
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    self._cond.wait()
+                    job = self._next_job()
+                job.status = "running"
+                self._running.append(job)
+                self._reserved_bytes += job.estimated_bytes
+            try:
+                job._run()
+            finally:
+                with self._cond:
+                    self._running.remove(job)
+                    self._reserved_bytes -= job.estimated_bytes
+                    self._cond.notify_all()
@@ -0,0 +1,155 @@
+import json
+import os
+import re
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+BAND_PERCENTILES = [5, 25, 50, 75, 95]
+# 2: bitiş dağılımı yüzdelik taslağı (terminal_quantiles) kaldırıldı
+RUN_FORMAT_VERSION = 2
+# Bant hesabında bir seferde kopyalanan eleman sayısı
+_BAND_BLOCK_ELEMENTS = 500_000
+
+_RUN_ID_RE = re.compile(r"^[0-9]{8}-[0-9]{6}-[0-9a-f]{6}$")
+
+
+def get_runs_dir(runs_dir: Optional[str] = None) -> str:
+    """Kayıtlı çalışmaların dizini (FINSIM_RUNS_DIR, varsayılan ./runs); sunucudaki tüm oturumlarca paylaşılır"""
+    return runs_dir or os.environ.get("FINSIM_RUNS_DIR", "./runs")
+
+
+def summarize_simulation(
+    bands: np.ndarray,
+    end_prices: np.ndarray,
+    sample_paths: np.ndarray,
+    num_bins: int = 100,
+) -> Dict[str, np.ndarray]:
+    """Hazır yüzdelik bantları, bitiş fiyatları ve örnek yollardan kompakt özet oluşturur"""
+    hist_counts, hist_edges = np.histogram(end_prices, bins=num_bins)
+    return {
+        "band_percentiles": np.asarray(BAND_PERCENTILES, dtype=np.float32),
+        "bands": np.asarray(bands, dtype=np.float32),
+        "hist_counts": hist_counts.astype(np.int64),
+        "hist_edges": hist_edges.astype(np.float64),
+        "sample_paths": np.ascontiguousarray(sample_paths, dtype=np.float32),
+    }
+
+
+def summarize_price_paths(
+    price_paths: np.ndarray,
+    num_bins: int = 100,
+    num_sample_paths: int = 50,
+) -> Dict[str, np.ndarray]:
+    """
+    Fiyat yolu matrisini kompakt özete indirger.
+
+    Returns:
+        dict: Periyot bazında yüzdelik bantları (float32), bitiş fiyatı histogramı ve float32 örnek yollar
+    """
+    # np.percentile girdiyi kopyalar; tam matris kopyası yerine periyot blokları kullanılır
+    rows = max(1, _BAND_BLOCK_ELEMENTS // max(1, price_paths.shape[1]))
+    bands = np.empty((len(BAND_PERCENTILES), price_paths.shape[0]))
+    for start in range(0, price_paths.shape[0], rows):
+        bands[:, start:start + rows] = np.percentile(price_paths[start:start + rows], BAND_PERCENTILES, axis=1)
+    num_sample_paths = min(num_sample_paths, price_paths.shape[1])
+    return summarize_simulation(bands, price_paths[-1], price_paths[:, :num_sample_paths], num_bins)
+
+
+def _to_jsonable(value: Any) -> Any:
+    """NumPy skalerlerini ve demetleri JSON'a uygun hale getirir"""
+    if isinstance(value, dict):
+        return {str(k): _to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_jsonable(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _run_path(run_id: str, runs_dir: Optional[str]) -> str:
+    if not _RUN_ID_RE.match(run_id):
+        raise ValueError(f"Geçersiz çalışma kimliği: {run_id}")
+    return os.path.join(get_runs_dir(runs_dir), f"{run_id}.npz")
+
+
+def save_run(
+    params: Dict[str, Any],
+    metrics: Dict[str, Any],
+    summary: Dict[str, np.ndarray],
+    runs_dir: Optional[str] = None,
+    include_sample_paths: bool = True,
+) -> str:
+    """Parametreleri, metrikleri ve özeti sıkıştırılmış tek bir .npz dosyasına yazar; çalışma kimliğini döndürür"""
+    now = datetime.now()
+    run_id = f"{now:%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+    meta = {
+        "version": RUN_FORMAT_VERSION,
+        "run_id": run_id,
+        "created_at": now.isoformat(timespec="seconds"),
+        "params": _to_jsonable(params),
+        "metrics": _to_jsonable(metrics),
+    }
+
+    arrays = {k: v for k, v in summary.items() if include_sample_paths or k != "sample_paths"}
+    os.makedirs(get_runs_dir(runs_dir), exist_ok=True)
+    with open(_run_path(run_id, runs_dir), "wb") as f:
+        np.savez_compressed(f, meta=np.array(json.dumps(meta, ensure_ascii=False)), **arrays)
+    return run_id
+
+
+def load_run(run_id: str, runs_dir: Optional[str] = None) -> Dict[str, Any]:
+    """Kayıtlı çalışmayı yükler: {"run_id", "created_at", "params", "metrics", "summary"}"""
+    with np.load(_run_path(run_id, runs_dir), allow_pickle=False) as data:
+        meta = json.loads(str(data["meta"]))
+        summary = {k: data[k] for k in data.files if k != "meta"}
+
+    metrics = meta["metrics"]
+    if isinstance(metrics.get("confidence_interval_95"), list):
+        metrics["confidence_interval_95"] = tuple(metrics["confidence_interval_95"])
+
+    return {
+        "run_id": meta["run_id"],
+        "created_at": meta["created_at"],
+        "params": meta["params"],
+        "metrics": metrics,
+        "summary": summary,
+    }
+
+
+def list_runs(runs_dir: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Kayıtlı çalışmaları en yeniden eskiye listeler (yalnızca meta veriler okunur)"""
+    directory = get_runs_dir(runs_dir)
+    if not os.path.isdir(directory):
+        return []
+
+    runs = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        run_id, ext = os.path.splitext(name)
+        if ext != ".npz" or not _RUN_ID_RE.match(run_id):
+            continue
+        try:
+            with np.load(os.path.join(directory, name), allow_pickle=False) as data:
+                meta = json.loads(str(data["meta"]))
+        except Exception:
+            continue
+        params = meta.get("params", {})
+        runs.append({
+            "run_id": run_id,
+            "created_at": meta.get("created_at"),
+            "price_col": params.get("price_col"),
+            "num_scenarios": params.get("num_scenarios"),
+            "num_periods": params.get("num_periods"),
+        })
+    return runs
+
+
+def describe_run(run: Dict[str, Any]) -> str:
+    """Seçim listeleri için kısa çalışma etiketi"""
+    return (
+        f"{run['created_at']} · {run['price_col']} · "
+        f"{run['num_scenarios']} senaryo / {run['num_periods']} periyot"
+    )
@@ -1,33 +1,272 @@
-from typing import Dict, Any, Tuple
+import threading
+import time
+from typing import Dict, Any, List, Optional, Sequence, Tuple
 
 import numpy as np
 import pandas as pd
 
+from src.tail_risk import TAIL_CONFIDENCE_LEVELS, sample_statistics, tail_risk_table
 
-def calculate_returns(df: pd.DataFrame, date_col: str, price_col: str) -> pd.Series:
-    """DataFrame'den periyodik getirileri hesaplar"""
+try:
+    import numba  # type: ignore
+except Exception:
+    numba = None  # type: ignore
+else:
+    # Çekirdek havuzun daemon işçilerinden çağrılır; TBB ilk kez böyle bir iş parçacığında başlatılırsa
+    # yorumlayıcı çıkışta asılı kalır. workqueue her kurulumda vardır ve çağrılar zaten kilitle sıralanır.
+    numba.config.THREADING_LAYER = "workqueue"
+
+
+SIMULATION_ENGINES = ["auto", "numba", "numpy"]
+RETURN_FREQUENCIES = {"native": "Dosya", "weekly": "Haftalık", "monthly": "Aylık"}
+# Çok sembollü sıralama metrikleri (hepsinde büyük değer daha az risk/daha iyi sonuç demektir)
+RANK_METRICS = {
+    "cvar_95_return_pct": "CVaR 95% Getiri",
+    "var_95_return_pct": "VaR 95% Getiri",
+    "gain_probability_pct": "Kazanma Olasılığı",
+}
+
+
+def _fill_growth(out: np.ndarray, mean_return: float, volatility: float, rng: np.random.Generator) -> None:
+    """Büyüme çarpanlarını (1 + getiri, sıfırda kesilmiş) ara matris oluşturmadan yerinde üretir"""
+    # rng.normal(ortalama, oynaklık) ile aynı sayılar; float32 doğrudan üretilir
+    rng.standard_normal(dtype=out.dtype, out=out)
+    out *= out.dtype.type(volatility)
+    out += out.dtype.type(mean_return)
+    out += 1.0
+    np.maximum(out, 0.0, out=out)
+
+
+# Düşüş hesabında geçici blok matrisinin eleman sayısı
+_DRAWDOWN_BLOCK_ELEMENTS = 1_000_000
+
+
+def _update_drawdowns(prices: np.ndarray, peak: np.ndarray, max_drawdowns: np.ndarray) -> None:
+    """
+    Periyot bloklarıyla (periyot x senaryo) zirve ve maksimum düşüşü günceller.
+    Her blokta tek bir geçici matris kullanılır: kümülatif zirve, ardından yerinde fiyat/zirve oranı.
+    """
+    rows = min(prices.shape[0], max(1, _DRAWDOWN_BLOCK_ELEMENTS // max(1, prices.shape[1])))
+    buffer = np.empty((rows, prices.shape[1]), dtype=prices.dtype)
+    for start in range(0, prices.shape[0], rows):
+        block = prices[start:start + rows]
+        running = buffer[:len(block)]
+        np.maximum.accumulate(block, axis=0, out=running)
+        np.maximum(running, peak, out=running)
+        peak[...] = running[-1]
+        # Zirvesi sıfır olan yollarda düşüş 0 sayılır
+        positive = running > 0
+        np.divide(block, running, out=running, where=positive)
+        np.copyto(running, 1.0, where=~positive)
+        np.maximum(max_drawdowns, 1.0 - running.min(axis=0), out=max_drawdowns)
+
+
+def _numpy_paths(
+    start_price: float,
+    mean_return: float,
+    volatility: float,
+    num_scenarios: int,
+    num_periods: int,
+    dtype: str = "float64",
+    rng: Optional[np.random.Generator] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """NumPy yolu: büyüme çarpanlarının kümülatif çarpımı ve periyot bazında düşüş takibi"""
+    rng = rng if rng is not None else np.random.default_rng()
+    # Rastgele getiri şokları doğrudan fiyat matrisine yazılır: 1 + getiri, negatif fiyatı önlemek için sıfırda kesilir
+    price_paths = np.empty((num_periods + 1, num_scenarios), dtype=dtype)
+    price_paths[0] = start_price
+    _fill_growth(price_paths[1:], mean_return, volatility, rng)
+
+    # Fiyat yollarını yerinde hesapla: ((S0 * g1) * g2) ..., periyot döngüsüyle aynı sıra
+    np.cumprod(price_paths, axis=0, out=price_paths)
+
+    # Maksimum düşüş (yol bağımlı)
+    peak = price_paths[0].copy()
+    max_drawdowns = np.zeros(num_scenarios, dtype=dtype)
+    _update_drawdowns(price_paths[1:], peak, max_drawdowns)
+
+    return price_paths, max_drawdowns
+
+
+# Numba yolunda her blok kendi tohumuyla başlar; sonuç iş parçacığı sayısından bağımsızdır
+_NUMBA_SEED_BLOCK = 256
+
+
+if numba is not None:
+
+    @numba.njit(parallel=True, cache=True)
+    def _numba_paths_kernel(start_price, mean_return, volatility, num_scenarios, num_periods, block_seeds):
+        """Numba yolu: RNG, bileşik getiri, sıfır tabanı ve düşüş takibi tek döngüde birleştirilir"""
+        paths = np.empty((num_scenarios, num_periods + 1))
+        max_drawdowns = np.empty(num_scenarios)
+        for b in numba.prange(len(block_seeds)):
+            # Üreteç durumu iş parçacığı başınadır; blok başında tohumlanır
+            np.random.seed(block_seeds[b])
+            for j in range(b * _NUMBA_SEED_BLOCK, min((b + 1) * _NUMBA_SEED_BLOCK, num_scenarios)):
+                price = start_price
+                peak = start_price
+                worst = 0.0
+                paths[j, 0] = price
+                for t in range(1, num_periods + 1):
+                    price = price * (1.0 + np.random.normal(mean_return, volatility))
+                    if price < 0.0:
+                        price = 0.0
+                    paths[j, t] = price
+                    if price > peak:
+                        peak = price
+                    elif peak > 0.0:
+                        drawdown = 1.0 - price / peak
+                        if drawdown > worst:
+                            worst = drawdown
+                max_drawdowns[j] = worst
+        return paths, max_drawdowns
+
+
+# Numba'nın workqueue katmanı aynı anda birden çok iş parçacığından çağrılmaya dayanıklı değildir;
+# havuz işçileri ve planlayıcı çekirdeği sırayla çağırır.
+_numba_kernel_lock = threading.Lock()
+
+
+def _numba_paths(
+    start_price: float,
+    mean_return: float,
+    volatility: float,
+    num_scenarios: int,
+    num_periods: int,
+    rng: Optional[np.random.Generator] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Numba çekirdeğini süreç genelinde kilit altında çağırır; senaryo-ana düzeni (periyot x senaryo) görünümüne çevrilir.
+    Senaryo blokları verilen üreteçten çekilen tohumlarla başlar; aynı tohumlu üreteç aynı yolları verir.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    num_blocks = -(-int(num_scenarios) // _NUMBA_SEED_BLOCK)
+    block_seeds = rng.integers(0, 2 ** 32, size=num_blocks, dtype=np.uint32)
+    with _numba_kernel_lock:
+        paths, max_drawdowns = _numba_paths_kernel(
+            float(start_price), float(mean_return), float(volatility), int(num_scenarios), int(num_periods),
+            block_seeds,
+        )
+    return paths.T, max_drawdowns
+
+
+def resolve_simulation_engine(engine: str = "auto", dtype: str = "float64") -> str:
+    """
+    Kullanılacak simülasyon motorunu belirler; Numba yoksa NumPy'a düşer.
+    Tek çekirdekte Numba'nın skaler RNG'si NumPy'dan yavaş olduğundan "auto" yalnızca çok çekirdekte Numba seçer.
+    Numba çekirdeği yalnızca float64 çalışır.
+    """
+    if engine not in SIMULATION_ENGINES:
+        raise ValueError(f"Bilinmeyen motor: {engine}. Seçenekler: {', '.join(SIMULATION_ENGINES)}")
+    if np.dtype(dtype) != np.float64:
+        return "numpy"
+    if engine == "auto":
+        return "numba" if numba is not None and numba.config.NUMBA_NUM_THREADS > 1 else "numpy"
+    if engine == "numba" and numba is None:
+        return "numpy"
+    return engine
+
+
+def _drawdown_block_bytes(num_periods: int, num_scenarios: int, itemsize: int) -> int:
+    """Düşüş hesabının geçici blok matrisi ve maskesi"""
+    rows = min(num_periods, max(1, _DRAWDOWN_BLOCK_ELEMENTS // max(1, num_scenarios)))
+    return int(rows * num_scenarios * (itemsize + 1))
+
+
+def estimate_simulation_bytes(num_periods: int, num_scenarios: int, itemsize: int = 8) -> int:
+    """Tek sembollü simülasyonun tepe bellek kullanımını tahmin eder (fiyat yolları + düşüş bloğu)"""
+    return int((num_periods + 1) * num_scenarios * itemsize + _drawdown_block_bytes(num_periods, num_scenarios, itemsize))
+
+
+def estimate_batched_simulation_bytes(
+    num_periods: int, num_scenarios: int, num_tickers: int, max_block_elements: int = 10_000_000, itemsize: int = 8
+) -> int:
+    """Toplu simülasyonun tepe bellek kullanımını tahmin eder (3B blok + senaryo x sembol sonuç matrisleri)"""
+    block = min(num_periods * num_scenarios * num_tickers, max(max_block_elements, num_periods * num_tickers))
+    return int((block + 3 * num_scenarios * num_tickers) * itemsize)
+
+
+def _return_moments(returns: pd.Series) -> Tuple[float, float]:
+    """Tarihi getirilerin ortalaması ve volatilitesi"""
+    mean_return = returns.mean()
+    volatility = returns.std()
+    if volatility == 0 or pd.isna(volatility):
+        raise ValueError("Volatilite hesaplanamadı (sıfır veya NaN). Fiyat verisi sabit mi?")
+    return float(mean_return), float(volatility)
+
+
+def _summarize_returns(simple: np.ndarray, log: np.ndarray) -> Dict[str, Any]:
+    """Getiri dizisinin özet istatistikleri (basit ve log getiri ortalaması/volatilitesi)"""
+    # Fiyat oranı pozitif olmayan adımların log getirisi NaN'dır
+    valid_log = log[~np.isnan(log)]
+    with np.errstate(invalid="ignore"):
+        return {
+            "count": int(len(simple)),
+            "mean_return": float(np.mean(simple)) if len(simple) else float("nan"),
+            "volatility": float(np.std(simple, ddof=1)) if len(simple) > 1 else float("nan"),
+            "mean_log_return": float(np.mean(valid_log)) if len(valid_log) else float("nan"),
+            "log_volatility": float(np.std(valid_log, ddof=1)) if len(valid_log) > 1 else float("nan"),
+        }
+
+
+def _returns_from_prices(timestamps: np.ndarray, prices: np.ndarray) -> Dict[str, Any]:
+    """
+    Sıralı fiyatlardan basit getirileri bitişik diziye çıkarır ve log getiri istatistiklerini hesaplar.
+    Basit getiriler fiyatların yüzde değişimidir (yalnızca NaN adımlar atılır); oranı pozitif olmayan
+    adımların log getirisi istatistiklere katılmaz.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = prices[1:] / prices[:-1]
+        simple = ratio - 1.0
+        log = np.where(ratio > 0, np.log(np.where(ratio > 0, ratio, 1.0)), np.nan)
+    valid = ~np.isnan(simple)
+    ts = np.ascontiguousarray(timestamps[1:][valid])
+    simple = np.ascontiguousarray(simple[valid])
+    return {"timestamps": ts, "simple": simple, "stats": _summarize_returns(simple, log[valid])}
+
+
+def build_returns_index(df: pd.DataFrame, date_col: str, price_col: str) -> Dict[str, Any]:
+    """
+    Getiri indeksini tek seferde oluşturur: tarih sırasına göre son fiyat ile her frekans için
+    (dosya, haftalık, aylık) bitişik basit getiri dizileri ve özet istatistikler.
+    """
     if date_col not in df.columns or price_col not in df.columns:
         raise ValueError(f"Belirtilen sütunlar ({date_col}, {price_col}) DataFrame'de bulunamadı.")
 
-    df_copy = df.copy()
+    dates = pd.to_datetime(df[date_col], errors='coerce')
+    prices = pd.to_numeric(df[price_col], errors='coerce')
+    valid = (dates.notna() & prices.notna()).to_numpy()
 
-    # Veri tiplerini dönüştür
-    df_copy[date_col] = pd.to_datetime(df_copy[date_col], errors='coerce')
-    df_copy[price_col] = pd.to_numeric(df_copy[price_col], errors='coerce')
+    timestamps = dates.to_numpy(dtype="datetime64[ns]")[valid]
+    values = prices.to_numpy(dtype=float)[valid]
+    order = np.argsort(timestamps, kind="mergesort")
+    timestamps = np.ascontiguousarray(timestamps[order])
+    values = np.ascontiguousarray(values[order])
 
-    # Eksik değerleri temizle
-    df_copy = df_copy.dropna(subset=[date_col, price_col])
+    frequencies = {"native": _returns_from_prices(timestamps, values)}
+    if frequencies["native"]["stats"]["count"] == 0:
+        raise ValueError("Getiri hesaplanamadı. Lütfen fiyat sütununun sayısal ve tarih sütununun kronolojik olduğundan emin olun.")
 
-    # Tarihe göre sırala ve index yap
-    df_copy = df_copy.sort_values(by=date_col).set_index(date_col)
+    # Haftalık/aylık: her dönemin son fiyatı
+    series = pd.Series(values, index=pd.DatetimeIndex(timestamps))
+    for name, period in (("weekly", "W"), ("monthly", "M")):
+        last = series.groupby(series.index.to_period(period)).last()
+        period_ends = series.index.to_series().groupby(series.index.to_period(period)).max()
+        frequencies[name] = _returns_from_prices(
+            period_ends.to_numpy(dtype="datetime64[ns]"), last.to_numpy(dtype=float)
+        )
 
-    # Yüzde değişimi hesapla
-    returns = df_copy[price_col].pct_change().dropna()
+    return {"last_price": float(values[-1]), "frequencies": frequencies}
 
-    if returns.empty:
-        raise ValueError("Getiri hesaplanamadı. Lütfen fiyat sütununun sayısal ve tarih sütununun kronolojik olduğundan emin olun.")
 
-    return returns
+def select_returns(returns_index: Dict[str, Any], frequency: str = "native") -> pd.Series:
+    """İndeksten istenen frekanstaki basit getirileri (kopyasız) seri olarak döndürür"""
+    if frequency not in RETURN_FREQUENCIES:
+        raise ValueError(f"Bilinmeyen frekans: {frequency}. Seçenekler: {', '.join(RETURN_FREQUENCIES)}")
+    entry = returns_index["frequencies"][frequency]
+    if entry["stats"]["count"] < 2:
+        raise ValueError(f"{RETURN_FREQUENCIES[frequency]} frekansta simülasyon için yeterli getiri yok.")
+    return pd.Series(entry["simple"], index=pd.DatetimeIndex(entry["timestamps"]), copy=False)
 
 
 def run_monte_carlo_simulation(
@@ -35,51 +274,160 @@ def run_monte_carlo_simulation(
     returns: pd.Series,
     num_scenarios: int = 10000,
     num_periods: int = 252,
-) -> Tuple[np.ndarray, Dict[str, float]]:
-    """Tarihi getirilere dayalı Monte Carlo simülasyonu çalıştırır"""
+    engine: str = "auto",
+    dtype: str = "float64",
+    rng: Optional[np.random.Generator] = None,
+) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """
+    Tarihi getirilere dayalı Monte Carlo simülasyonu çalıştırır.
+    Her iki motor da verilen üreteci (yoksa yeni bir default_rng) kullanır; Numba çekirdeği tohumlarını bu üreteçten çeker.
+    Eşzamanlı işler global RandomState kilidini paylaşmaz.
+    """
     # Tarihi istatistikleri hesapla
-    mean_return = returns.mean()
-    volatility = returns.std()
-    if volatility == 0 or pd.isna(volatility):
-        raise ValueError("Volatilite hesaplanamadı (sıfır veya NaN). Fiyat verisi sabit mi?")
+    mean_return, volatility = _return_moments(returns)
 
-    # Rastgele getiri şokları üret
-    daily_returns_shocks = np.random.normal(
-        mean_return, volatility, (num_periods, num_scenarios)
-    )
+    chosen_engine = resolve_simulation_engine(engine, dtype)
+    if chosen_engine == "numba":
+        price_paths, max_drawdowns = _numba_paths(start_price, mean_return, volatility, num_scenarios, num_periods, rng)
+    else:
+        price_paths, max_drawdowns = _numpy_paths(
+            start_price, mean_return, volatility, num_scenarios, num_periods, dtype, rng
+        )
 
-    # Fiyat yollarını hesapla
-    price_paths = np.zeros((num_periods + 1, num_scenarios))
-    price_paths[0] = start_price
+    stats = {
+        "mean_return": mean_return,
+        "volatility": volatility,
+        "median_max_drawdown_pct": float(np.median(max_drawdowns) * 100.0),
+        "engine": chosen_engine,
+        "dtype": str(price_paths.dtype),
+    }
+    return price_paths, stats
 
-    for t in range(1, num_periods + 1):
-        price_paths[t] = price_paths[t - 1] * (1 + daily_returns_shocks[t - 1])
-        # Negatif fiyatları önle
-        price_paths[t] = np.maximum(0, price_paths[t])
 
-    stats = {"mean_return": float(mean_return), "volatility": float(volatility)}
-    return price_paths, stats
+def run_streaming_monte_carlo_simulation(
+    start_price: float,
+    returns: pd.Series,
+    num_scenarios: int = 10000,
+    num_periods: int = 252,
+    chunk_periods: int = 21,
+    dtype: str = "float32",
+    band_percentiles: Tuple[float, ...] = (5, 25, 50, 75, 95),
+    num_sample_paths: int = 50,
+    rng: Optional[np.random.Generator] = None,
+) -> Tuple[np.ndarray, Dict[str, np.ndarray], Dict[str, Any]]:
+    """
+    Tam fiyat yolu matrisini tutmadan, periyot blokları halinde akışlı simülasyon çalıştırır.
+    Her blokta periyot bazında yüzdelikler kesin olarak hesaplanır; yalnızca güncel fiyat vektörü taşınır.
+
+    Returns:
+        tuple: (bitiş fiyatları, {"bands", "sample_paths"}, istatistikler)
+    """
+    mean_return, volatility = _return_moments(returns)
+    rng = rng if rng is not None else np.random.default_rng()
+    chunk_periods = max(1, min(int(chunk_periods), int(num_periods)))
+    num_sample_paths = min(num_sample_paths, num_scenarios)
+
+    prices = np.full(num_scenarios, start_price, dtype=dtype)
+    peak = prices.copy()
+    max_drawdowns = np.zeros(num_scenarios, dtype=dtype)
+    bands = np.empty((len(band_percentiles), num_periods + 1), dtype=np.float32)
+    bands[:, 0] = start_price
+    sample_paths = np.empty((num_periods + 1, num_sample_paths), dtype=np.float32)
+    sample_paths[0] = start_price
+    block = np.empty((chunk_periods, num_scenarios), dtype=dtype)
 
+    for start in range(0, num_periods, chunk_periods):
+        stop = min(start + chunk_periods, num_periods)
+        current = block[: stop - start]
+        _fill_growth(current, mean_return, volatility, rng)
+        # Yoğun yolla aynı çarpım sırası: önceki fiyat ilk çarpana katılır
+        current[0] *= prices
+        np.cumprod(current, axis=0, out=current)
+
+        bands[:, start + 1: stop + 1] = np.percentile(current, band_percentiles, axis=1)
+        sample_paths[start + 1: stop + 1] = current[:, :num_sample_paths]
+        _update_drawdowns(current, peak, max_drawdowns)
+        prices = current[-1].copy()
+
+    stats = {
+        "mean_return": mean_return,
+        "volatility": volatility,
+        "median_max_drawdown_pct": float(np.median(max_drawdowns) * 100.0),
+        "engine": "numpy",
+        "dtype": str(block.dtype),
+    }
+    return prices, {"bands": bands, "sample_paths": sample_paths}, stats
 
-def analyze_simulation_results(price_paths: np.ndarray, start_price: float) -> Dict[str, Any]:
-    """Simülasyon sonuçlarını analiz eder ve risk metriklerini hesaplar"""
+
+def compare_simulation_engines(
+    start_price: float,
+    returns: pd.Series,
+    num_scenarios: int = 10000,
+    num_periods: int = 252,
+    repeats: int = 3,
+) -> Dict[str, Any]:
+    """
+    NumPy ve Numba motorlarını süre ve dağılım istatistikleri açısından karşılaştırır.
+    Numba yoksa yalnızca NumPy sonuçları döner. İlk (derleme) çağrısı süreye dahil edilmez.
+    """
+    engines = ["numpy"] + (["numba"] if numba is not None else [])
+    comparison: Dict[str, Any] = {}
+    for name in engines:
+        # Isınma (JIT derlemesi)
+        run_monte_carlo_simulation(start_price, returns, 100, 2, engine=name)
+        timings = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            price_paths, stats = run_monte_carlo_simulation(
+                start_price, returns, num_scenarios, num_periods, engine=name
+            )
+            timings.append(time.perf_counter() - t0)
+        end_prices = price_paths[-1]
+        comparison[name] = {
+            "best_seconds": float(min(timings)),
+            "mean_end_price": float(np.mean(end_prices)),
+            "std_end_price": float(np.std(end_prices)),
+            "p05_end_price": float(np.percentile(end_prices, 5)),
+            "p95_end_price": float(np.percentile(end_prices, 95)),
+            "median_max_drawdown_pct": stats["median_max_drawdown_pct"],
+        }
+    if "numba" in comparison:
+        comparison["speedup"] = comparison["numpy"]["best_seconds"] / max(comparison["numba"]["best_seconds"], 1e-12)
+    return comparison
+
+
+def analyze_simulation_results(
+    price_paths: np.ndarray,
+    start_price: float,
+    confidence_levels: Sequence[float] = TAIL_CONFIDENCE_LEVELS,
+    horizons: Optional[Sequence[int]] = None,
+) -> Dict[str, Any]:
+    """
+    Simülasyon sonuçlarını analiz eder ve risk metriklerini hesaplar (fiyat yolları veya yalnızca bitiş fiyatları).
+    Bitiş ufkunda medyan, %95 güven aralığı ve tüm VaR/CVaR düzeyleri tek seçim geçişiyle hesaplanır;
+    "tail_risk" tablosu bu sonucu yeniden kullanır, yalnızca ara ufuklar ayrıca seçilir.
+    """
     # Bitiş fiyatları
-    end_prices = price_paths[-1]
+    end_prices = np.atleast_2d(price_paths)[-1]
+
+    # Bitiş ufkunda medyan, güven aralığı ve VaR/CVaR (%95 her zaman dahil)
+    levels = sorted(set(confidence_levels) | {0.95})
+    stats = sample_statistics(end_prices, levels, percentiles=(2.5, 97.5))
+    var, cvar = stats["var"], stats["cvar"]
+    var_95 = float(var[levels.index(0.95)])
+    var_95_return = (var_95 - start_price) / start_price
+    cvar_95 = float(cvar[levels.index(0.95)])
+    cvar_95_return = (cvar_95 - start_price) / start_price
 
     # Temel istatistikler
     average_end_price = float(np.mean(end_prices))
-    median_end_price = float(np.median(end_prices))
+    median_end_price = stats["median"]
 
     # Kazanma olasılığı
     gain_probability = float(np.sum(end_prices > start_price) / len(end_prices))
 
-    # VaR (Value at Risk) %95
-    var_95 = float(np.percentile(end_prices, 5))
-    var_95_return = (var_95 - start_price) / start_price
-
-    # CVaR (Conditional Value at Risk) %95
-    cvar_95 = float(end_prices[end_prices <= var_95].mean())
-    cvar_95_return = (cvar_95 - start_price) / start_price
+    order = [levels.index(c) for c in confidence_levels]
+    final_tail = (var[order], cvar[order])
 
     return {
         "start_price": float(start_price),
@@ -90,10 +438,119 @@ def analyze_simulation_results(price_paths: np.ndarray, start_price: float) -> D
         "var_95_return_pct": var_95_return * 100.0,
         "cvar_95_value": cvar_95,
         "cvar_95_return_pct": cvar_95_return * 100.0,
-        "confidence_interval_95": (
-            float(np.percentile(end_prices, 2.5)),
-            float(np.percentile(end_prices, 97.5)),
-        ),
+        "confidence_interval_95": tuple(float(v) for v in stats["percentiles"]),
+        "tail_risk": tail_risk_table(price_paths, start_price, confidence_levels, horizons, final_tail=final_tail),
     }
 
 
+def calculate_returns_by_ticker(
+    df: pd.DataFrame, date_col: str, ticker_col: str, price_col: str
+) -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    Uzun formatlı (tarih, sembol, fiyat) veriden tüm semboller için getirileri tek geçişte hesaplar.
+
+    Returns:
+        tuple: (tarih x sembol getiri tablosu, sembol bazında son geçerli fiyatlar)
+    """
+    for col in (date_col, ticker_col, price_col):
+        if col not in df.columns:
+            raise ValueError(f"Belirtilen sütun ({col}) DataFrame'de bulunamadı.")
+
+    # Veri tiplerini tek seferde dönüştür
+    long_df = pd.DataFrame({
+        "date": pd.to_datetime(df[date_col], errors='coerce'),
+        "ticker": df[ticker_col].astype(str).str.strip(),
+        "price": pd.to_numeric(df[price_col], errors='coerce'),
+    }).dropna()
+    long_df = long_df[long_df["ticker"] != ""]
+
+    # Aynı (tarih, sembol) için son kaydı tut; her sembol kendi gözlem takvimine göre sıralanır
+    long_df = long_df.drop_duplicates(subset=["date", "ticker"], keep="last")
+    long_df = long_df.sort_values(["ticker", "date"], kind="mergesort")
+
+    # Getiriler sembolün ardışık gözlemleri arasında hesaplanır (diğer sembollerin tarihleri boşluk yaratmaz)
+    long_df["return"] = long_df.groupby("ticker", sort=False)["price"].pct_change()
+    last_prices = long_df.groupby("ticker")["price"].last()
+    long_returns = long_df.dropna(subset=["return"])
+    returns = long_returns.pivot(index="date", columns="ticker", values="return").sort_index()
+    # Tek gözlemli semboller de sütun olarak kalır (atlananlar listesinde görünür)
+    returns = returns.reindex(columns=last_prices.index)
+
+    if returns.empty or returns.notna().sum().sum() == 0:
+        raise ValueError("Getiri hesaplanamadı. Lütfen sembol, tarih ve fiyat sütunlarını kontrol edin.")
+
+    return returns, last_prices
+
+
+def run_batched_monte_carlo_simulation(
+    start_prices: np.ndarray,
+    returns: pd.DataFrame,
+    num_scenarios: int = 10000,
+    num_periods: int = 252,
+    max_block_elements: int = 10_000_000,
+    rng: Optional[np.random.Generator] = None,
+) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Tüm semboller için Monte Carlo simülasyonunu tek bir 3B hesaplama (periyot x senaryo x sembol) olarak çalıştırır.
+    Bellek için senaryo ekseni bloklara bölünür; yalnızca bitiş fiyatları (senaryo x sembol) döndürülür.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    start_prices = np.asarray(start_prices, dtype=float)
+    mean_returns = returns.mean().to_numpy(dtype=float)
+    volatilities = returns.std().to_numpy(dtype=float)
+    if np.any(~np.isfinite(volatilities)) or np.any(volatilities == 0):
+        raise ValueError("Bazı semboller için volatilite hesaplanamadı (sıfır veya NaN).")
+
+    num_tickers = len(mean_returns)
+    end_prices = np.empty((num_scenarios, num_tickers))
+    block = max(1, int(max_block_elements // max(1, num_periods * num_tickers)))
+
+    for start in range(0, num_scenarios, block):
+        stop = min(start + block, num_scenarios)
+        # Büyüme çarpanları: 1 + getiri, negatif fiyatı önlemek için sıfırda kesilir
+        growth = rng.normal(mean_returns, volatilities, (num_periods, stop - start, num_tickers))
+        growth += 1.0
+        np.maximum(growth, 0.0, out=growth)
+        end_prices[start:stop] = start_prices * growth.prod(axis=0)
+
+    stats = {"mean_return": mean_returns, "volatility": volatilities}
+    return end_prices, stats
+
+
+def analyze_batched_results(
+    end_prices: np.ndarray,
+    start_prices: np.ndarray,
+    tickers: List[str],
+    rank_by: str = "cvar_95_return_pct",
+    ascending: bool = False,
+) -> pd.DataFrame:
+    """Sembol bazında risk metriklerini hesaplar ve sıralı tablo döndürür"""
+    start_prices = np.asarray(start_prices, dtype=float)
+
+    average_end = end_prices.mean(axis=0)
+    median_end = np.median(end_prices, axis=0)
+    gain_probability = (end_prices > start_prices).mean(axis=0)
+
+    # VaR ve CVaR %95 (sembol ekseni boyunca)
+    var_95 = np.percentile(end_prices, 5, axis=0)
+    tail = np.where(end_prices <= var_95, end_prices, np.nan)
+    cvar_95 = np.nanmean(tail, axis=0)
+
+    table = pd.DataFrame({
+        "ticker": list(tickers),
+        "start_price": start_prices,
+        "average_end_price": average_end,
+        "median_end_price": median_end,
+        "gain_probability_pct": gain_probability * 100.0,
+        "var_95_value": var_95,
+        "var_95_return_pct": (var_95 - start_prices) / start_prices * 100.0,
+        "cvar_95_value": cvar_95,
+        "cvar_95_return_pct": (cvar_95 - start_prices) / start_prices * 100.0,
+    })
+
+    if rank_by not in table.columns:
+        raise ValueError(f"Sıralama metriği ({rank_by}) bulunamadı.")
+
+    table = table.sort_values(by=rank_by, ascending=ascending, kind="mergesort").reset_index(drop=True)
+    table.insert(0, "rank", np.arange(1, len(table) + 1))
+    return table
@@ -0,0 +1,227 @@
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.run_store import summarize_price_paths, summarize_simulation
+from src.simulation_engine import (
+    analyze_simulation_results,
+    estimate_simulation_bytes,
+    numba,
+    resolve_simulation_engine,
+    run_monte_carlo_simulation,
+    run_streaming_monte_carlo_simulation,
+)
+
+
+# Akışlı modda örnek yollar ve bantlar için sabit pay
+_NUM_SAMPLE_PATHS = 50
+_NUM_BANDS = 5
+# Kalibrasyon koşularının boyutu: iki periyot sayısı x senaryo
+_CALIBRATION_PERIODS = (10, 40)
+_CALIBRATION_SCENARIOS = 20_000
+
+# Kalibrasyonlar süreç genelinde sırayla çalışır: eşzamanlı oturumlar ölçümü ikiye katlamaz
+# ve birbirlerinin çekişmesini ölçmez. Planlayıcı önbelleği yalnızca okur, ölçüm havuz işinde yapılır
+_calibration_lock = threading.Lock()
+_calibration_cache: Dict[Tuple[str, str, str], Tuple[float, float]] = {}
+
+
+def get_job_memory_budget(pool_budget_bytes: int, max_workers: int) -> int:
+    """İş başına bellek bütçesi (FINSIM_JOB_MEMORY_MB, varsayılan: havuz bütçesi / işçi sayısı)"""
+    configured = os.environ.get("FINSIM_JOB_MEMORY_MB")
+    if configured:
+        return int(configured) * 1024 ** 2
+    return int(pool_budget_bytes // max(1, max_workers))
+
+
+def estimate_streaming_bytes(num_periods: int, num_scenarios: int, chunk_periods: int, itemsize: int) -> int:
+    """Akışlı simülasyonun tepe bellek kullanımını tahmin eder (blok + yüzdelik kopyası + vektörler + özet)"""
+    block = chunk_periods * num_scenarios * itemsize
+    # Fiyat/zirve/düşüş vektörleri + bitiş analizinin float64 kopyaları
+    vectors = 4 * num_scenarios * itemsize + 2 * num_scenarios * 8
+    summary = (num_periods + 1) * (_NUM_BANDS + _NUM_SAMPLE_PATHS) * 4
+    return int(2 * block + vectors + summary)
+
+
+def minimum_plan_bytes(num_periods: int, num_scenarios: int) -> int:
+    """Herhangi bir planın ulaşabileceği en düşük bellek (float32, 1 periyotluk blok)"""
+    return estimate_streaming_bytes(num_periods, num_scenarios, 1, 4)
+
+
+def calibrate_throughput(engine: str, dtype: str, output: str) -> Tuple[float, float]:
+    """
+    İki küçük kalibrasyon koşusuyla işin (simülasyon, risk analizi ve özet) süre modelini çıkarır:
+    süre ≈ a · periyot · senaryo + b · senaryo. İkinci terim periyottan bağımsız bitiş analizini kapsar.
+    Her (motor, dtype, çıktı) için süreç başına bir kez, kilit altında çalışır; aynı anda gelen oturumlar
+    ilk ölçümün bitmesini bekler. Numba için ilk (derleme) çağrısı ölçüme dahil edilmez.
+
+    Returns:
+        (eleman başına saniye, senaryo başına saniye)
+    """
+    key = (engine, dtype, output)
+    with _calibration_lock:
+        if key not in _calibration_cache:
+            _calibration_cache[key] = _measure_throughput(engine, dtype, output)
+        return _calibration_cache[key]
+
+
+def calibrate_planner(engines: Iterable[str] = ("numpy",)) -> Dict[Tuple[str, str, str], Tuple[float, float]]:
+    """
+    Planlayıcının seçebileceği tüm (motor, dtype, çıktı) birleşimlerini kalibre eder.
+    Havuz açılışında tek bir havuz işi olarak çalıştırılır; betik iş parçacığını ve bütçe dışını meşgul etmez.
+    """
+    for engine in dict.fromkeys(engines):
+        for dtype in ("float64", "float32"):
+            # Numba float32 çalıştırmaz; planlayıcı bu birleşimi NumPy olarak kaydeder
+            if resolve_simulation_engine(engine, dtype) == engine:
+                calibrate_throughput(engine, dtype, "dense")
+    for dtype in ("float64", "float32"):
+        calibrate_throughput("numpy", dtype, "streaming")
+    return dict(_calibration_cache)
+
+
+def calibration_bytes() -> int:
+    """Kalibrasyon işinin tahmini tepe belleği (en uzun yoğun float64 koşusu)"""
+    return estimate_simulation_bytes(max(_CALIBRATION_PERIODS), _CALIBRATION_SCENARIOS, 8)
+
+
+def estimate_plan_seconds(plan: Dict[str, Any]) -> Optional[float]:
+    """Plan için tahmini süre; kalibrasyon henüz bitmediyse None (beklemez)"""
+    throughput = _calibration_cache.get((plan["engine"], plan["dtype"], plan["output"]))
+    if throughput is None:
+        return None
+    per_element, per_scenario = throughput
+    return float((per_element * plan["num_periods"] + per_scenario) * plan["num_scenarios"])
+
+
+def _measure_throughput(engine: str, dtype: str, output: str) -> Tuple[float, float]:
+    """calibrate_throughput için ölçüm koşuları (kilit altında çağrılır)"""
+    num_scenarios = _CALIBRATION_SCENARIOS
+    returns = pd.Series(np.random.default_rng(0).normal(0.0005, 0.01, 250))
+
+    def _run(num_periods: int) -> float:
+        t0 = time.perf_counter()
+        if output == "streaming":
+            end_prices, outputs, _ = run_streaming_monte_carlo_simulation(
+                100.0, returns, num_scenarios, num_periods, chunk_periods=num_periods // 2, dtype=dtype
+            )
+            analyze_simulation_results(end_prices, 100.0)
+            summarize_simulation(outputs["bands"], end_prices, outputs["sample_paths"])
+        else:
+            price_paths, _ = run_monte_carlo_simulation(
+                100.0, returns, num_scenarios, num_periods, engine=engine, dtype=dtype
+            )
+            analyze_simulation_results(price_paths, 100.0, horizons=[num_periods // 2, num_periods])
+            summarize_price_paths(price_paths)
+        return time.perf_counter() - t0
+
+    short, long = _CALIBRATION_PERIODS
+    _run(short)
+    short_seconds = min(_run(short) for _ in range(2))
+    long_seconds = min(_run(long) for _ in range(2))
+    per_element = max((long_seconds - short_seconds) / ((long - short) * num_scenarios), 0.0)
+    per_scenario = max(short_seconds / num_scenarios - per_element * short, 0.0)
+    return per_element, per_scenario
+
+
+def plan_simulation(
+    num_periods: int,
+    num_scenarios: int,
+    memory_budget_bytes: int,
+    engine: str = "auto",
+    concurrent_jobs: int = 1,
+) -> Dict[str, Any]:
+    """
+    Simülasyon başlamadan önce bellek ve süre maliyetini tahmin eder ve bütçeye uyan planı seçer.
+
+    Sırasıyla denenir: yoğun float64, yoğun float32, akışlı float64, akışlı float32.
+    Yoğun mod tam fiyat yolu matrisini tutar; akışlı mod periyot blokları halinde ilerler ve yalnızca özet tutar.
+    Numba çekirdeği tüm çekirdekleri kullanır ve süreç genelinde sırayla çağrılır; aynı anda birden fazla iş
+    çalışabiliyorsa (`concurrent_jobs` > 1) "auto" NumPy seçer, işler birbirini çekirdek kilidinde beklemez.
+    Süre tahmini havuz açılışındaki kalibrasyondan okunur; kalibrasyon bitmediyse None olur.
+
+    Returns:
+        dict: dtype, çıktı tipi, blok boyutu, motor, paralellik, tahmini bellek/süre ve gerekçe
+    """
+    if num_periods < 1 or num_scenarios < 1:
+        raise ValueError("Periyot ve senaryo sayısı pozitif olmalıdır.")
+    if engine == "auto" and concurrent_jobs > 1:
+        engine = "numpy"
+
+    plan: Dict[str, Any] = {
+        "num_periods": int(num_periods),
+        "num_scenarios": int(num_scenarios),
+        "memory_budget_bytes": int(memory_budget_bytes),
+    }
+
+    for dtype, itemsize in (("float64", 8), ("float32", 4)):
+        dense_bytes = estimate_simulation_bytes(num_periods, num_scenarios, itemsize)
+        if dense_bytes <= memory_budget_bytes:
+            chosen_engine = resolve_simulation_engine(engine, dtype)
+            plan.update({
+                "dtype": dtype,
+                "output": "dense",
+                "chunk_periods": int(num_periods),
+                "engine": chosen_engine,
+                "parallel": chosen_engine == "numba",
+                "estimated_bytes": dense_bytes,
+                "reason": (
+                    "Tam fiyat yolu matrisi bütçeye sığıyor."
+                    if dtype == "float64"
+                    else "float64 matris bütçeyi aştığı için float32 seçildi."
+                ),
+            })
+            break
+    else:
+        for dtype, itemsize in (("float64", 8), ("float32", 4)):
+            fixed = estimate_streaming_bytes(num_periods, num_scenarios, 0, itemsize)
+            per_period = 2 * num_scenarios * itemsize
+            chunk = int((memory_budget_bytes - fixed) // per_period)
+            # float64'te çok küçük bloklar yerine float32'ye geç
+            if chunk >= min(num_periods, 5):
+                chunk = min(chunk, num_periods)
+                plan.update({
+                    "dtype": dtype,
+                    "output": "streaming",
+                    "chunk_periods": chunk,
+                    "engine": "numpy",
+                    "parallel": False,
+                    "estimated_bytes": estimate_streaming_bytes(num_periods, num_scenarios, chunk, itemsize),
+                    "reason": f"Tam matris bütçeyi aştığı için {chunk} periyotluk bloklarla akışlı çalışılıyor.",
+                })
+                break
+        else:
+            if minimum_plan_bytes(num_periods, num_scenarios) > memory_budget_bytes:
+                raise ValueError(
+                    f"Simülasyon en küçük blokla bile bellek bütçesine "
+                    f"({memory_budget_bytes / 1024 ** 2:.0f} MB) sığmıyor."
+                )
+            plan.update({
+                "dtype": "float32",
+                "output": "streaming",
+                "chunk_periods": 1,
+                "engine": "numpy",
+                "parallel": False,
+                "estimated_bytes": minimum_plan_bytes(num_periods, num_scenarios),
+                "reason": "Bütçe çok dar; periyot periyot akışlı çalışılıyor.",
+            })
+
+    plan["estimated_seconds"] = estimate_plan_seconds(plan)
+    plan["numba_available"] = numba is not None
+    return plan
+
+
+def describe_plan(plan: Dict[str, Any]) -> str:
+    """Plan için kısa, kullanıcıya gösterilecek açıklama"""
+    output = "yoğun (tam matris)" if plan["output"] == "dense" else f"akışlı ({plan['chunk_periods']} periyotluk bloklar)"
+    mode = "paralel (Numba)" if plan["parallel"] else "seri (NumPy)"
+    seconds = plan.get("estimated_seconds")
+    duration = f"{seconds:.1f} sn" if seconds is not None else "süre kalibrasyon sürdüğü için bilinmiyor"
+    return (
+        f"{plan['dtype']} · {output} · {mode} · "
+        f"tahmini {plan['estimated_bytes'] / 1024 ** 2:.1f} MB / {duration}"
+    )
@@ -0,0 +1,207 @@
+import math
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+TAIL_CONFIDENCE_LEVELS = (0.90, 0.95, 0.975, 0.99, 0.995)
+
+
+def _confidence_percentiles(confidence_levels: Sequence[float]) -> List[float]:
+    """Güven düzeylerini kuyruk yüzdeliklerine çevirir (0.95 -> 5.0); ondalık hata yuvarlanarak giderilir"""
+    return [round((1.0 - c) * 100.0, 10) for c in confidence_levels]
+
+
+def _percentile_positions(num_samples: int, percentiles: Sequence[float]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """np.percentile (linear) ile aynı sanal indeksler: (n - 1) · q / 100, alt/üst sıra ve ağırlık"""
+    quantiles = np.asarray(percentiles, dtype=np.float64) / 100.0
+    virtual = (num_samples - 1) * quantiles
+    lower = np.floor(virtual)
+    weight = virtual - lower
+    lower = lower.astype(np.int64)
+    upper = np.minimum(lower + 1, num_samples - 1)
+    return lower, upper, weight
+
+
+def _lerp(a: np.ndarray, b: np.ndarray, weight: np.ndarray) -> np.ndarray:
+    """
+    np.percentile'ın tek yüzdelikli çağrısındaki doğrusal enterpolasyon.
+    Ağırlık ve (1 - ağırlık) float64'te hesaplanıp örnek tipine çevrilir; float32 örneklerde de aynı sonucu verir.
+    """
+    t = weight.astype(a.dtype)
+    one_minus_t = (1.0 - weight).astype(a.dtype)
+    diff = b - a
+    return np.where(weight >= 0.5, b - diff * one_minus_t, a + diff * t)
+
+
+def sample_statistics(
+    samples: np.ndarray,
+    confidence_levels: Sequence[float] = TAIL_CONFIDENCE_LEVELS,
+    percentiles: Sequence[float] = (),
+) -> Dict[str, Any]:
+    """
+    Tek bir seçim (np.partition) geçişiyle VaR/CVaR, ek yüzdelikler ve medyanı birlikte hesaplar.
+
+    Gereken tüm sıralar (kuyruk sınırı, yüzdelik komşuları, orta eleman(lar)) aynı partition çağrısına
+    verilir; yalnızca en geniş kuyruğu kapsayan küçük dilim ayrıca sıralanır. Yüzdelikler np.percentile,
+    medyan np.median ile aynı değeri verir. CVaR, VaR'a eşit veya altındaki örneklerin ortalamasıdır;
+    dilim sınırında eşit değerler varsa tam maske ile hesaplanır.
+
+    Returns:
+        dict: var, cvar (güven düzeyleri sırasıyla), percentiles (istenen sırayla), median
+    """
+    values = np.asarray(samples).ravel()
+    num_samples = len(values)
+    lower, upper, weight = _percentile_positions(num_samples, _confidence_percentiles(confidence_levels))
+    extra_lower, extra_upper, extra_weight = _percentile_positions(num_samples, percentiles)
+    middle = [num_samples // 2] if num_samples % 2 else [num_samples // 2 - 1, num_samples // 2]
+
+    cutoff = int(upper.max())
+    kth = np.unique(np.concatenate([[cutoff], extra_lower, extra_upper, middle]))
+    ordered = np.partition(values, kth)
+    # Kuyruk dilimi yerinde sıralanır; kth sıraları dilimin içinde de dışında da geçerli kalır
+    tail = ordered[:cutoff + 1]
+    tail.sort()
+
+    var = _lerp(tail[lower], tail[upper], weight)
+    extra = _lerp(ordered[extra_lower], ordered[extra_upper], extra_weight)
+    median = ordered[middle].mean()
+
+    cvar = np.empty(len(var))
+    boundary = tail[-1]
+    for i, threshold in enumerate(var):
+        if threshold >= boundary and len(tail) < num_samples:
+            # Dilim dışında aynı değere sahip örnekler olabilir
+            cvar[i] = float(values[values <= threshold].mean())
+        else:
+            count = int(np.searchsorted(tail, threshold, side="right"))
+            cvar[i] = float(tail[:count].mean())
+
+    return {
+        "var": var.astype(np.float64),
+        "cvar": cvar,
+        "percentiles": extra.astype(np.float64),
+        "median": float(median),
+    }
+
+
+def tail_risk_from_samples(
+    samples: np.ndarray,
+    confidence_levels: Sequence[float] = TAIL_CONFIDENCE_LEVELS,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Birden çok güven düzeyinde VaR ve CVaR (bkz. sample_statistics).
+
+    Returns:
+        (var, cvar): Güven düzeyleriyle aynı sırada diziler
+    """
+    stats = sample_statistics(samples, confidence_levels)
+    return stats["var"], stats["cvar"]
+
+
+def tail_risk_of_rows(
+    samples: np.ndarray,
+    confidence: float,
+    counts: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Matrisin her satırı için VaR (np.percentile ile aynı alt yüzdelik) ve CVaR (VaR'a eşit veya altındaki
+    örneklerin ortalaması); satır döngüsü yoktur. Satırlar yerinde yeniden düzenlenir.
+
+    Eşit uzunluktaki satırlarda tek bir partition çağrısı yeterlidir. Satır uzunlukları farklıysa `counts`
+    her satırdaki geçerli örnek sayısıdır; geçerli örnekler başta, dolgu (+inf) sonda olmalıdır. Satırlar
+    sıralanır ve her satır kendi sayısına göre indekslenir.
+
+    Returns:
+        (var, cvar): Satır başına diziler
+    """
+    percentile = _confidence_percentiles([confidence])
+    if counts is None:
+        lower, upper, weight = _percentile_positions(samples.shape[1], percentile)
+        samples.partition(np.unique(np.concatenate([lower, upper])), axis=1)
+        var = _lerp(samples[:, lower[0]], samples[:, upper[0]], weight)
+    else:
+        lower, upper, weight = _percentile_positions(np.asarray(counts), percentile)
+        samples.sort(axis=1)
+        rows = np.arange(samples.shape[0])
+        var = _lerp(samples[rows, lower], samples[rows, upper], weight)
+
+    # Dolgu (+inf) eşiğin üstünde kaldığından maskeye girmez
+    tail = samples <= var[:, None]
+    cvar = np.sum(samples, axis=1, where=tail) / np.count_nonzero(tail, axis=1)
+    return var.astype(np.float64), cvar
+
+
+def tail_risk_table(
+    price_paths: np.ndarray,
+    start_price: float,
+    confidence_levels: Sequence[float] = TAIL_CONFIDENCE_LEVELS,
+    horizons: Optional[Sequence[int]] = None,
+    final_tail: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Fiyat yolu matrisinin (periyot x senaryo) istenen ufuklarında çok düzeyli VaR/CVaR tablosu.
+    Yalnızca bitiş fiyatları verilirse tek ufuk (son periyot) kullanılır.
+
+    Args:
+        final_tail: Son ufuk için önceden hesaplanmış (var, cvar); verilirse son ufukta seçim tekrarlanmaz
+
+    Returns:
+        list[dict]: horizon, confidence, var_value, var_return_pct, cvar_value, cvar_return_pct
+    """
+    paths = np.atleast_2d(price_paths)
+    last = paths.shape[0] - 1
+    if horizons is None or paths.shape[0] == 1:
+        horizons = [last]
+
+    rows = []
+    for horizon in sorted({min(max(int(h), 0), last) for h in horizons}):
+        if horizon == last and final_tail is not None:
+            var, cvar = final_tail
+        else:
+            var, cvar = tail_risk_from_samples(paths[horizon], confidence_levels)
+        label = horizon if paths.shape[0] > 1 else None
+        for confidence, var_value, cvar_value in zip(confidence_levels, var, cvar):
+            rows.append(_tail_row(label, confidence, float(var_value), float(cvar_value), start_price))
+    return rows
+
+
+def lognormal_tail_risk(
+    start_price: float,
+    mean_log_return: float,
+    log_volatility: float,
+    num_periods: int,
+    confidence_levels: Sequence[float] = TAIL_CONFIDENCE_LEVELS,
+) -> List[Dict[str, Any]]:
+    """
+    Log-normal fiyat varsayımıyla kapalı form VaR/CVaR (O(1), simülasyon gerektirmez).
+
+    m = μ·P, s = σ·√P, z = Φ⁻¹(1 - güven):
+        VaR  = S0·exp(m + s·z)
+        CVaR = S0·exp(m + s²/2)·Φ(z - s) / (1 - güven)
+    """
+    m = mean_log_return * num_periods
+    s = log_volatility * math.sqrt(num_periods)
+    normal = NormalDist()
+
+    rows = []
+    for confidence in confidence_levels:
+        alpha = 1.0 - confidence
+        z = normal.inv_cdf(alpha)
+        var_value = start_price * math.exp(m + s * z)
+        cvar_value = start_price * math.exp(m + s * s / 2.0) * normal.cdf(z - s) / alpha
+        rows.append(_tail_row(int(num_periods), confidence, var_value, cvar_value, start_price))
+    return rows
+
+
+def _tail_row(horizon: Optional[int], confidence: float, var_value: float, cvar_value: float,
+              start_price: float) -> Dict[str, Any]:
+    return {
+        "horizon": horizon,
+        "confidence": float(confidence),
+        "var_value": var_value,
+        "var_return_pct": (var_value - start_price) / start_price * 100.0,
+        "cvar_value": cvar_value,
+        "cvar_return_pct": (cvar_value - start_price) / start_price * 100.0,
+    }
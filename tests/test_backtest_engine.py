@@ -0,0 +1,89 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.backtest_engine import (
+    _historical_forecasts,
+    _window_bounds,
+    _window_moments,
+    christoffersen_independence_test,
+    kupiec_pof_test,
+    run_var_backtest,
+)
+from src.tail_risk import tail_risk_of_rows
+
+
+def test_kupiec_matches_hand_computed_statistic():
+    # LR = -2 [x ln p + (N - x) ln(1 - p) - x ln(x/N) - (N - x) ln(1 - x/N)], N = 250, x = 20, p = 0.05
+    result = kupiec_pof_test(20, 250, 0.95)
+    assert result["lr_statistic"] == pytest.approx(4.039520476139202, rel=1e-12)
+    # Ki-kare(1): 3.841 ≈ %5 kritik değer
+    assert result["p_value"] == pytest.approx(0.0444464, rel=1e-5)
+
+    # İstisna yoksa LR = -2 N ln(1 - p)
+    assert kupiec_pof_test(0, 250, 0.95)["lr_statistic"] == pytest.approx(-500.0 * math.log(0.95), rel=1e-12)
+
+
+def test_christoffersen_matches_hand_computed_statistic():
+    result = christoffersen_independence_test(np.array([0, 0, 0, 1, 1, 1, 0, 0, 0, 0]))
+
+    assert (result["n00"], result["n01"], result["n10"], result["n11"]) == (5, 1, 1, 2)
+    # π0 = 1/6, π1 = 2/3, π = 1/3
+    expected = -2.0 * (
+        3 * math.log(1 / 3) + 6 * math.log(2 / 3)
+        - (math.log(1 / 6) + 5 * math.log(5 / 6) + 2 * math.log(2 / 3) + math.log(1 / 3))
+    )
+    assert result["lr_statistic"] == pytest.approx(expected, rel=1e-12)
+    assert result["lr_statistic"] == pytest.approx(2.231435513142099, rel=1e-12)
+
+
+def test_christoffersen_is_zero_when_exceptions_are_independent():
+    # π0 = π1 = π = 1/3
+    result = christoffersen_independence_test(np.array([0, 0, 1, 1, 0, 0, 0, 1, 0, 0]))
+    assert result["lr_statistic"] == pytest.approx(0.0, abs=1e-12)
+
+
+@pytest.mark.parametrize("expanding", [False, True])
+def test_window_moments_match_brute_force(expanding):
+    values = np.random.default_rng(0).normal(0.001, 0.02, 400) + 5.0
+    starts, ends = _window_bounds(len(values), 30, expanding)
+    means, stds = _window_moments(values, starts, ends)
+
+    np.testing.assert_allclose(means, [values[a:b].mean() for a, b in zip(starts, ends)], rtol=1e-10)
+    np.testing.assert_allclose(stds, [values[a:b].std(ddof=1) for a, b in zip(starts, ends)], rtol=1e-8)
+
+
+def test_tail_of_rows_matches_np_percentile():
+    samples = np.random.default_rng(1).normal(size=(300, 257))
+    expected_var = np.percentile(samples, 5, axis=1)
+    expected_cvar = [row[row <= q].mean() for row, q in zip(samples, expected_var)]
+
+    var, cvar = tail_risk_of_rows(samples.copy(), 0.95)
+
+    np.testing.assert_array_equal(var, expected_var)
+    np.testing.assert_allclose(cvar, expected_cvar, rtol=1e-12)
+
+
+@pytest.mark.parametrize("expanding", [False, True])
+def test_historical_forecasts_match_per_window_percentile(expanding):
+    values = np.random.default_rng(2).normal(0.0, 0.02, 300)
+    starts, ends = _window_bounds(len(values), 40, expanding)
+    # Küçük blok: pencereler birden çok bloğa bölünür
+    var, cvar = _historical_forecasts(values, starts, ends, 0.95, max_block_elements=2000)
+
+    windows = [values[a:b] for a, b in zip(starts, ends)]
+    expected_var = np.array([np.percentile(w, 5) for w in windows])
+    np.testing.assert_array_equal(var, expected_var)
+    np.testing.assert_allclose(cvar, [w[w <= q].mean() for w, q in zip(windows, expected_var)], rtol=1e-12)
+
+
+def test_monte_carlo_backtest_reports_consistent_counts():
+    returns = pd.Series(np.random.default_rng(3).normal(0.0005, 0.02, 600))
+    result = run_var_backtest(returns, window=100, num_scenarios=500, rng=np.random.default_rng(4))
+
+    forecasts = result["forecasts"]
+    assert result["num_observations"] == len(forecasts) == 500
+    assert result["num_exceptions"] == int(forecasts["exception"].sum())
+    assert (forecasts["cvar_return"] <= forecasts["var_return"]).all()
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+from src.data_inspector import detect_ticker_column, profile_columns
+
+
+def test_monotonicity_skips_missing_cells():
+    df = pd.DataFrame({
+        "Tarih": pd.to_datetime(["2024-01-01", None, "2024-01-03", "2024-01-04", None, "2024-01-08"]),
+        "Fiyat": [1.0, np.nan, np.nan, 3.0, 2.0, np.nan],
+        "Boş": [np.nan] * 6,
+    })
+    profile = profile_columns(df).set_index("column")
+
+    # Seyrek tarih sütunu boş olmayan değerleri üzerinden tam monoton
+    assert profile.loc["Tarih", "monotonic_ratio"] == 1.0
+    # 1 -> 3 -> 2: bir artış, bir azalış
+    assert profile.loc["Fiyat", "monotonic_ratio"] == 0.5
+    assert profile.loc["Boş", "monotonic_ratio"] == 0.0
+
+
+def test_sparse_text_dates_are_monotonic():
+    dates = pd.Series(pd.date_range("2024-01-01", periods=40).strftime("%Y-%m-%d"), dtype=object)
+    dates[::3] = None
+    profile = profile_columns(pd.DataFrame({"Tarih": dates})).set_index("column")
+
+    assert profile.loc["Tarih", "monotonic_ratio"] == 1.0
+
+
+def test_date_parsing_runs_only_on_date_shaped_text(monkeypatch):
+    parsed_columns = []
+    to_datetime = pd.to_datetime
+
+    def counting_to_datetime(arg, *args, **kwargs):
+        parsed_columns.append(getattr(arg, "name", None))
+        return to_datetime(arg, *args, **kwargs)
+
+    monkeypatch.setattr(pd, "to_datetime", counting_to_datetime)
+    df = pd.DataFrame({
+        "Gün": ["31.01.2024", "01.02.2024", "02.02.2024"],
+        "Tarih": ["1/31/2024", "2/1/2024", "2/2/2024"],
+        "Sembol": ["AAA", "BBB", "C-1"],
+        "Not": ["iyi", "kötü", None],
+    })
+    profile = profile_columns(df).set_index("column")
+
+    assert parsed_columns == ["Gün", "Tarih"]
+    assert (profile.loc[["Gün", "Tarih"], "date_ratio"] > 0).all()
+    assert (profile.loc[["Sembol", "Not"], "date_ratio"] == 0).all()
+
+
+def test_detects_ticker_column_in_long_format():
+    dates = pd.date_range("2024-01-01", periods=30).strftime("%Y-%m-%d")
+    long_df = pd.DataFrame({
+        "Date": np.repeat(dates, 3),
+        "Symbol": np.tile(["AAA", "BBB", "CCC"], 30),
+        "Close": np.arange(90, dtype=float),
+    })
+
+    assert detect_ticker_column(long_df, "Date") == "Symbol"
+    # Geniş format: her tarih bir kez görünür
+    wide_df = pd.DataFrame({"Date": dates, "AAA": np.arange(30.0), "BBB": np.arange(30.0)})
+    assert detect_ticker_column(wide_df, "Date") is None
+    # Tekrarlı tarihler ama (tarih, sembol) çiftleri tekil değil
+    duplicated = long_df.assign(Symbol="AAA")
+    assert detect_ticker_column(duplicated, "Date") is None
+    assert detect_ticker_column(long_df, None) is None
@@ -0,0 +1,161 @@
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from src.execution import SimulationWorkerPool, traced_peak_bytes
+from src.simulation_engine import numba
+
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+@pytest.mark.skipif(numba is None, reason="numba kurulu değil")
+@pytest.mark.parametrize("threading_layer", ["workqueue", "default", "tbb"])
+def test_concurrent_numba_jobs_through_pool(threading_layer):
+    # İş parçacığı katmanı süreç başına bir kez seçildiğinden ayrı süreçte çalıştırılır;
+    # ortamda "default" veya "tbb" istense de çekirdek workqueue'ya sabitlenir ve süreç temiz kapanır
+    script = textwrap.dedent("""
+        import numba
+        import numpy as np
+        import pandas as pd
+        from src.execution import SimulationWorkerPool
+        from src.simulation_engine import run_monte_carlo_simulation
+
+        pool = SimulationWorkerPool(max_workers=4, max_jobs_per_session=4)
+        returns = pd.Series(np.random.default_rng(0).normal(0.0005, 0.02, 500))
+        jobs = [
+            pool.submit(f"session-{i}", run_monte_carlo_simulation, 100.0, returns, 20000, 50, engine="numba")
+            for i in range(8)
+        ]
+        engines = {job.result(timeout=120)[1]["engine"] for job in jobs}
+        assert engines == {"numba"}, engines
+        assert numba.threading_layer() == "workqueue"
+    """)
+    env = dict(os.environ, NUMBA_NUM_THREADS="4", NUMBA_THREADING_LAYER=threading_layer)
+    completed = subprocess.run(
+        [sys.executable, "-c", script], cwd=ROOT, env=env, capture_output=True, text=True, timeout=300
+    )
+    assert completed.returncode == 0, completed.stderr[-2000:]
+
+
+def test_memory_tracing_is_off_unless_enabled():
+    with traced_peak_bytes() as measured:
+        data = bytearray(1_000_000)
+    del data
+
+    assert measured == {"bytes": None, "exclusive": None}
+
+
+def test_job_overlapping_a_finished_job_is_not_exclusive():
+    with traced_peak_bytes(True) as outer:
+        with traced_peak_bytes(True) as inner:
+            data = bytearray(5_000_000)
+        del data
+
+    assert inner["bytes"] >= 5_000_000 and not inner["exclusive"]
+    # Dış ölçüm içteki işin ayırmalarını da içerir; yalnız başına ölçülmüş sayılmamalı
+    assert not outer["exclusive"]
+
+    with traced_peak_bytes(True) as alone:
+        data = bytearray(1_000_000)
+    del data
+    assert alone["exclusive"] and alone["bytes"] >= 1_000_000
+
+
+def _blocking_job(pool, session_id, log, name, estimated_bytes=0):
+    """Serbest bırakılana kadar süren ve başladığında adını kaydeden iş"""
+    release = threading.Event()
+    started = threading.Event()
+
+    def run():
+        started.set()
+        log.append(name)
+        release.wait(10)
+        return name
+
+    job = pool.submit(session_id, run, estimated_bytes=estimated_bytes)
+    return job, started, release
+
+
+def test_jobs_are_dispatched_round_robin_across_sessions():
+    pool = SimulationWorkerPool(max_workers=1, max_jobs_per_session=3)
+    log = []
+    blocker, started, release = _blocking_job(pool, "busy", log, "blocker")
+    assert started.wait(5)
+    jobs = [pool.submit(s, log.append, name) for s, name in (("a", "a1"), ("a", "a2"), ("b", "b1"))]
+
+    assert [j.position() for j in jobs] == [1, 3, 2]
+    assert blocker.position() == 0
+    release.set()
+    for job in jobs:
+        job.result(timeout=5)
+    assert log == ["blocker", "a1", "b1", "a2"]
+
+
+def test_session_limit_and_budget_are_enforced():
+    pool = SimulationWorkerPool(max_workers=1, memory_budget_bytes=100, max_jobs_per_session=1)
+    log = []
+    job, started, release = _blocking_job(pool, "a", log, "first")
+
+    with pytest.raises(ValueError):
+        pool.submit("a", log.append, "second")
+    with pytest.raises(ValueError):
+        pool.submit("b", log.append, "too-big", estimated_bytes=101)
+    release.set()
+    assert job.result(timeout=5) == "first"
+
+
+def test_cancel_removes_only_queued_jobs():
+    pool = SimulationWorkerPool(max_workers=1)
+    log = []
+    running, started, release = _blocking_job(pool, "a", log, "running")
+    assert started.wait(5)
+    queued = pool.submit("b", log.append, "queued")
+
+    assert not running.cancel()
+    assert queued.cancel()
+    assert queued.status == "cancelled" and queued.position() == 0
+    with pytest.raises(RuntimeError):
+        queued.result(timeout=1)
+    release.set()
+    running.result(timeout=5)
+    assert log == ["running"]
+
+
+def test_smaller_jobs_do_not_overtake_an_overdue_large_job():
+    pool = SimulationWorkerPool(max_workers=2, memory_budget_bytes=100, max_head_wait_seconds=0.0)
+    log = []
+    small, started, release = _blocking_job(pool, "a", log, "small", estimated_bytes=40)
+    assert started.wait(5)
+    large = pool.submit("b", log.append, "large", estimated_bytes=80)
+    later = pool.submit("c", log.append, "later", estimated_bytes=40)
+
+    # İkinci işçi boş ve sonraki küçük iş bütçeye sığsa da büyük iş beklerken başlamaz
+    time.sleep(0.3)
+    assert not later.done()
+    assert large.position() == 1 and later.position() == 2
+    release.set()
+    large.result(timeout=5)
+    later.result(timeout=5)
+    assert log == ["small", "large", "later"]
+
+
+def test_smaller_jobs_may_use_spare_budget_before_the_wait_limit():
+    pool = SimulationWorkerPool(max_workers=2, memory_budget_bytes=100, max_head_wait_seconds=60.0)
+    log = []
+    small, started, release = _blocking_job(pool, "a", log, "small", estimated_bytes=40)
+    assert started.wait(5)
+    large = pool.submit("b", log.append, "large", estimated_bytes=80)
+    later = pool.submit("c", log.append, "later", estimated_bytes=40)
+
+    later.result(timeout=5)
+    assert not large.done()
+    release.set()
+    large.result(timeout=5)
+    assert log == ["small", "later", "large"]
@@ -0,0 +1,87 @@
+import os
+
+import numpy as np
+import pytest
+
+from src.run_store import list_runs, load_run, save_run, summarize_price_paths
+
+
+def _price_paths(num_periods=252, num_scenarios=10_000, seed=0):
+    growth = 1.0 + np.random.default_rng(seed).normal(0.0005, 0.02, (num_periods, num_scenarios))
+    return 100.0 * np.vstack([np.ones(num_scenarios), np.cumprod(growth, axis=0)])
+
+
+def _metrics(price_paths):
+    end_prices = price_paths[-1]
+    return {
+        "start_price": 100.0,
+        "average_end_price": np.float64(end_prices.mean()),
+        "confidence_interval_95": (np.float64(np.percentile(end_prices, 2.5)), np.float64(np.percentile(end_prices, 97.5))),
+        "tail_risk": [{"confidence": 0.95, "horizon": 252, "var_value": np.float64(90.0)}],
+    }
+
+
+PARAMS = {"price_col": "Kapanış", "num_scenarios": 10_000, "num_periods": 252, "ticker_col": None}
+
+
+def test_save_and_load_round_trip(tmp_path):
+    price_paths = _price_paths()
+    summary = summarize_price_paths(price_paths)
+    metrics = _metrics(price_paths)
+
+    run_id = save_run(PARAMS, metrics, summary, runs_dir=str(tmp_path))
+    run = load_run(run_id, runs_dir=str(tmp_path))
+
+    assert run["run_id"] == run_id
+    assert run["params"] == PARAMS
+    assert run["metrics"]["average_end_price"] == metrics["average_end_price"]
+    assert run["metrics"]["confidence_interval_95"] == metrics["confidence_interval_95"]
+    assert run["metrics"]["tail_risk"] == [{"confidence": 0.95, "horizon": 252, "var_value": 90.0}]
+    assert set(run["summary"]) == set(summary)
+    for key, values in summary.items():
+        np.testing.assert_array_equal(run["summary"][key], values)
+    np.testing.assert_array_equal(run["summary"]["sample_paths"], price_paths[:, :50].astype(np.float32))
+
+
+def test_saved_run_is_a_few_hundred_kb(tmp_path):
+    price_paths = _price_paths()
+    run_id = save_run(PARAMS, _metrics(price_paths), summarize_price_paths(price_paths), runs_dir=str(tmp_path))
+
+    size = os.path.getsize(tmp_path / f"{run_id}.npz")
+    # Tam float64 matris ~20 MB; kayıt bunun küçük bir kesri olmalı
+    assert size < 500 * 1024
+    assert size < price_paths.nbytes / 40
+
+
+def test_sample_paths_can_be_left_out(tmp_path):
+    price_paths = _price_paths(num_periods=20, num_scenarios=500)
+    run_id = save_run(
+        PARAMS, _metrics(price_paths), summarize_price_paths(price_paths),
+        runs_dir=str(tmp_path), include_sample_paths=False,
+    )
+
+    assert "sample_paths" not in load_run(run_id, runs_dir=str(tmp_path))["summary"]
+
+
+@pytest.mark.parametrize("run_id", ["../secret", "20240101-120000-abcdeg", "20240101-120000-abcdef.npz", ""])
+def test_invalid_run_ids_are_rejected(tmp_path, run_id):
+    with pytest.raises(ValueError):
+        load_run(run_id, runs_dir=str(tmp_path))
+
+
+def test_list_runs_newest_first_and_skips_foreign_files(tmp_path):
+    price_paths = _price_paths(num_periods=20, num_scenarios=500)
+    summary = summarize_price_paths(price_paths)
+    first = save_run({**PARAMS, "price_col": "A"}, _metrics(price_paths), summary, runs_dir=str(tmp_path))
+    second = save_run({**PARAMS, "price_col": "B"}, _metrics(price_paths), summary, runs_dir=str(tmp_path))
+    # Eşleşmeyen ad, bozuk dosya ve başka uzantı listelenmez
+    (tmp_path / "notes.npz").write_bytes(b"")
+    (tmp_path / "20240101-120000-abcdef.npz").write_bytes(b"not a zip")
+    (tmp_path / "20240101-120000-abcdef.txt").write_text("x")
+
+    runs = list_runs(runs_dir=str(tmp_path))
+
+    assert [r["run_id"] for r in runs] == sorted([first, second], reverse=True)
+    assert {r["price_col"] for r in runs} == {"A", "B"}
+    assert runs[0]["num_scenarios"] == 10_000
+    assert list_runs(runs_dir=str(tmp_path / "missing")) == []
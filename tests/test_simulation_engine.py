@@ -0,0 +1,194 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.simulation_engine import (
+    _numpy_paths,
+    analyze_batched_results,
+    build_returns_index,
+    calculate_returns_by_ticker,
+    compare_simulation_engines,
+    numba,
+    run_batched_monte_carlo_simulation,
+    run_monte_carlo_simulation,
+    run_streaming_monte_carlo_simulation,
+    select_returns,
+)
+
+
+MEAN_RETURN = 0.0005
+VOLATILITY = 0.02
+
+
+def _reference_paths(start_price, mean_return, volatility, num_scenarios, num_periods, rng):
+    """Vektörleştirme öncesi periyot döngüsü (başlangıç sürümündeki hesap)"""
+    shocks = rng.normal(mean_return, volatility, (num_periods, num_scenarios))
+    price_paths = np.zeros((num_periods + 1, num_scenarios))
+    price_paths[0] = start_price
+    for t in range(1, num_periods + 1):
+        price_paths[t] = price_paths[t - 1] * (1 + shocks[t - 1])
+        price_paths[t] = np.maximum(0, price_paths[t])
+    return price_paths
+
+
+def _reference_drawdowns(price_paths):
+    peak = price_paths[0].copy()
+    max_drawdowns = np.zeros(price_paths.shape[1])
+    for t in range(1, price_paths.shape[0]):
+        peak = np.maximum(peak, price_paths[t])
+        drawdown = np.where(peak > 0, 1.0 - price_paths[t] / np.where(peak > 0, peak, 1.0), 0.0)
+        max_drawdowns = np.maximum(max_drawdowns, drawdown)
+    return max_drawdowns
+
+
+def _returns(seed=0):
+    return pd.Series(np.random.default_rng(seed).normal(MEAN_RETURN, VOLATILITY, 500))
+
+
+@pytest.mark.parametrize("volatility", [VOLATILITY, 0.8])
+def test_numpy_paths_match_period_loop(volatility):
+    # Yüksek oynaklıkta sıfıra kesilen yollar da karşılaştırılır
+    expected = _reference_paths(100.0, MEAN_RETURN, volatility, 2000, 60, np.random.default_rng(42))
+    price_paths, max_drawdowns = _numpy_paths(
+        100.0, MEAN_RETURN, volatility, 2000, 60, rng=np.random.default_rng(42)
+    )
+
+    np.testing.assert_array_equal(price_paths, expected)
+    np.testing.assert_array_equal(max_drawdowns, _reference_drawdowns(expected))
+
+
+def test_streaming_matches_dense_under_same_seed():
+    returns = _returns()
+    price_paths, dense_stats = run_monte_carlo_simulation(
+        100.0, returns, 3000, 50, engine="numpy", rng=np.random.default_rng(7)
+    )
+    end_prices, outputs, streaming_stats = run_streaming_monte_carlo_simulation(
+        100.0, returns, 3000, 50, chunk_periods=7, dtype="float64", rng=np.random.default_rng(7)
+    )
+
+    np.testing.assert_array_equal(end_prices, price_paths[-1])
+    np.testing.assert_array_equal(outputs["sample_paths"], price_paths[:, :50].astype(np.float32))
+    assert streaming_stats["median_max_drawdown_pct"] == dense_stats["median_max_drawdown_pct"]
+
+
+@pytest.mark.skipif(numba is None, reason="numba kurulu değil")
+def test_numba_and_numpy_distributions_agree():
+    returns = _returns()
+    numpy_paths, numpy_stats = run_monte_carlo_simulation(
+        100.0, returns, 20000, 252, engine="numpy", rng=np.random.default_rng(1)
+    )
+    numba_paths, numba_stats = run_monte_carlo_simulation(100.0, returns, 20000, 252, engine="numba")
+
+    assert numba_stats["engine"] == "numba"
+    numpy_end, numba_end = numpy_paths[-1], numba_paths[-1]
+    assert np.mean(numba_end) == pytest.approx(np.mean(numpy_end), rel=0.02)
+    assert np.percentile(numba_end, 5) == pytest.approx(np.percentile(numpy_end, 5), rel=0.02)
+    assert numba_stats["median_max_drawdown_pct"] == pytest.approx(numpy_stats["median_max_drawdown_pct"], abs=1.0)
+
+
+@pytest.mark.skipif(numba is None, reason="numba kurulu değil")
+def test_numba_engine_is_reproducible_under_the_same_seed():
+    returns = _returns()
+    # Son blok kısmi: senaryo sayısı blok boyutunun katı değil
+    first, _ = run_monte_carlo_simulation(100.0, returns, 1000, 30, engine="numba", rng=np.random.default_rng(11))
+    second, _ = run_monte_carlo_simulation(100.0, returns, 1000, 30, engine="numba", rng=np.random.default_rng(11))
+    other, _ = run_monte_carlo_simulation(100.0, returns, 1000, 30, engine="numba", rng=np.random.default_rng(12))
+
+    np.testing.assert_array_equal(first, second)
+    assert not np.array_equal(first, other)
+
+
+def test_compare_simulation_engines_reports_each_engine():
+    comparison = compare_simulation_engines(100.0, _returns(), num_scenarios=2000, num_periods=20, repeats=1)
+
+    expected = {"numpy"} | ({"numba"} if numba is not None else set())
+    assert expected <= set(comparison)
+    for name in expected:
+        assert comparison[name]["best_seconds"] > 0
+        assert comparison[name]["p05_end_price"] < comparison[name]["mean_end_price"]
+
+
+def test_ticker_returns_follow_each_ticker_calendar():
+    # Günlük bir sembol ve iki iş gününde bir işlem gören bir sembol
+    daily_dates = pd.bdate_range("2024-01-01", periods=200)
+    alt_dates = daily_dates[::2]
+    rng = np.random.default_rng(5)
+    daily_prices = 100.0 * np.cumprod(1.0 + rng.normal(0.0, 0.01, len(daily_dates)))
+    alt_prices = 50.0 * np.cumprod(1.0 + rng.normal(0.0, 0.01, len(alt_dates)))
+    df = pd.concat([
+        pd.DataFrame({"Tarih": daily_dates, "Sembol": "DAILY", "Fiyat": daily_prices}),
+        pd.DataFrame({"Tarih": alt_dates, "Sembol": "ALT", "Fiyat": alt_prices}),
+    ]).sample(frac=1.0, random_state=0)
+
+    returns, last_prices = calculate_returns_by_ticker(df, "Tarih", "Sembol", "Fiyat")
+
+    assert returns.count().to_dict() == {"ALT": 99, "DAILY": 199}
+    # Boşluğu aşan getiri tek sembollü hesapla aynıdır
+    np.testing.assert_allclose(returns["ALT"].dropna().to_numpy(), alt_prices[1:] / alt_prices[:-1] - 1.0)
+    np.testing.assert_allclose(returns["DAILY"].dropna().to_numpy(), daily_prices[1:] / daily_prices[:-1] - 1.0)
+    assert last_prices.to_dict() == {"ALT": alt_prices[-1], "DAILY": daily_prices[-1]}
+
+
+def test_native_returns_match_sorted_pct_change():
+    dates = pd.bdate_range("2024-01-01", periods=120)
+    prices = 100.0 * np.cumprod(1.0 + np.random.default_rng(6).normal(0.0, 0.01, len(dates)))
+    df = pd.DataFrame({"Tarih": dates.strftime("%Y-%m-%d"), "Fiyat": prices.astype(object)})
+    df.loc[[5, 40], "Fiyat"] = "yok"
+    df = df.sample(frac=1.0, random_state=1)
+
+    index = build_returns_index(df, "Tarih", "Fiyat")
+    returns = select_returns(index)
+
+    clean = pd.Series(pd.to_numeric(df["Fiyat"], errors="coerce").to_numpy(), index=pd.to_datetime(df["Tarih"]))
+    expected = clean.dropna().sort_index().pct_change().dropna()
+    np.testing.assert_allclose(returns.to_numpy(), expected.to_numpy(), rtol=1e-12)
+    assert (returns.index == expected.index).all()
+    # Başlangıç fiyatı dosyanın son satırı değil, tarih sırasındaki son fiyattır
+    assert index["last_price"] == prices[-1]
+
+
+def test_batched_single_ticker_matches_single_run_under_same_seed():
+    returns = _returns()
+    price_paths, _ = run_monte_carlo_simulation(
+        100.0, returns, 3000, 40, engine="numpy", rng=np.random.default_rng(11)
+    )
+    end_prices, stats = run_batched_monte_carlo_simulation(
+        np.array([100.0]), returns.to_frame("A"), 3000, 40, rng=np.random.default_rng(11)
+    )
+
+    assert end_prices.shape == (3000, 1)
+    np.testing.assert_allclose(end_prices[:, 0], price_paths[-1], rtol=1e-12)
+    assert stats["volatility"][0] == returns.std()
+
+
+def test_batched_blocks_keep_ticker_moments():
+    rng = np.random.default_rng(3)
+    returns = pd.DataFrame({"A": rng.normal(0.001, 0.01, 400), "B": rng.normal(-0.001, 0.03, 400)})
+    # Küçük blok: senaryo ekseni birçok parçaya bölünür
+    end_prices, _ = run_batched_monte_carlo_simulation(
+        np.array([50.0, 200.0]), returns, 20_000, 20, max_block_elements=2_000, rng=np.random.default_rng(5)
+    )
+
+    log_growth = np.log(end_prices / np.array([50.0, 200.0]))
+    expected_std = np.sqrt(20) * returns.std().to_numpy()
+    np.testing.assert_allclose(log_growth.std(axis=0), expected_std, rtol=0.05)
+    assert log_growth[:, 0].mean() > log_growth[:, 1].mean()
+
+
+def test_batched_ranking_orders_by_selected_metric():
+    start_prices = np.array([100.0, 100.0, 100.0])
+    # Sütunlar: dar dağılım, geniş dağılım, düşük medyanlı ama dar kuyruklu
+    end_prices = np.column_stack([
+        np.linspace(95.0, 105.0, 1000),
+        np.linspace(60.0, 150.0, 1000),
+        np.linspace(97.0, 101.0, 1000),
+    ])
+
+    by_cvar = analyze_batched_results(end_prices, start_prices, ["A", "B", "C"])
+    by_gain = analyze_batched_results(end_prices, start_prices, ["A", "B", "C"], rank_by="gain_probability_pct")
+
+    assert list(by_cvar["ticker"]) == ["C", "A", "B"]
+    assert list(by_cvar["rank"]) == [1, 2, 3]
+    assert list(by_gain["ticker"]) == ["B", "A", "C"]
+    with pytest.raises(ValueError):
+        analyze_batched_results(end_prices, start_prices, ["A", "B", "C"], rank_by="unknown")
@@ -0,0 +1,69 @@
+import threading
+import time
+
+from src import simulation_planner
+from src.simulation_engine import resolve_simulation_engine
+
+
+def test_concurrent_calibration_measures_once(monkeypatch):
+    calls = []
+
+    def measure(engine, dtype, output):
+        calls.append((engine, dtype, output))
+        time.sleep(0.2)
+        return 1e-9, 1e-7
+
+    monkeypatch.setattr(simulation_planner, "_measure_throughput", measure)
+    monkeypatch.setattr(simulation_planner, "_calibration_cache", {})
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(simulation_planner.calibrate_throughput("numpy", "float64", "dense")))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == [("numpy", "float64", "dense")]
+    assert results == [(1e-9, 1e-7)] * 4
+
+
+def test_planning_reads_calibration_without_measuring(monkeypatch):
+    def measure(engine, dtype, output):
+        raise AssertionError("planlayıcı ölçüm yapmamalı")
+
+    monkeypatch.setattr(simulation_planner, "_measure_throughput", measure)
+    monkeypatch.setattr(simulation_planner, "_calibration_cache", {})
+
+    pending = simulation_planner.plan_simulation(252, 10_000, 1024 ** 3, concurrent_jobs=4)
+    assert pending["estimated_seconds"] is None
+    assert "bilinmiyor" in simulation_planner.describe_plan(pending)
+
+    simulation_planner._calibration_cache[("numpy", "float64", "dense")] = (1e-9, 1e-7)
+    ready = simulation_planner.plan_simulation(252, 10_000, 1024 ** 3, concurrent_jobs=4)
+    assert ready["estimated_seconds"] == (1e-9 * 252 + 1e-7) * 10_000
+
+
+def test_calibrate_planner_covers_every_plan(monkeypatch):
+    monkeypatch.setattr(simulation_planner, "_measure_throughput", lambda *args: (1e-9, 1e-7))
+    monkeypatch.setattr(simulation_planner, "_calibration_cache", {})
+
+    simulation_planner.calibrate_planner(["numpy"])
+
+    for budget in (1024 ** 3, 20 * 1024 ** 2, 2 * 1024 ** 2):
+        plan = simulation_planner.plan_simulation(252, 10_000, budget, concurrent_jobs=4)
+        assert plan["estimated_seconds"] is not None
+
+
+def test_auto_engine_is_numpy_when_jobs_run_concurrently(monkeypatch):
+    monkeypatch.setattr(simulation_planner, "_calibration_cache", {})
+
+    single = simulation_planner.plan_simulation(252, 10_000, 1024 ** 3, concurrent_jobs=1)
+    pooled = simulation_planner.plan_simulation(252, 10_000, 1024 ** 3, concurrent_jobs=4)
+    explicit = simulation_planner.plan_simulation(252, 10_000, 1024 ** 3, engine="numba", concurrent_jobs=4)
+
+    assert single["engine"] == resolve_simulation_engine("auto")
+    assert pooled["engine"] == "numpy" and not pooled["parallel"]
+    assert explicit["engine"] == resolve_simulation_engine("numba")
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from src.simulation_engine import analyze_simulation_results
+from src.tail_risk import TAIL_CONFIDENCE_LEVELS, sample_statistics, tail_risk_from_samples, tail_risk_table
+
+
+TAIL_PERCENTILES = (10, 5, 2.5, 1, 0.5)
+
+
+def _samples(num_samples, dtype, seed=0):
+    return (100.0 * np.random.default_rng(seed).lognormal(0.0, 0.2, num_samples)).astype(dtype)
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+@pytest.mark.parametrize("num_samples", [1, 2, 3, 7, 10_000, 200_000])
+def test_var_matches_np_percentile_exactly(num_samples, dtype):
+    samples = _samples(num_samples, dtype)
+    var, cvar = tail_risk_from_samples(samples, TAIL_CONFIDENCE_LEVELS)
+
+    for i, percentile in enumerate(TAIL_PERCENTILES):
+        assert var[i] == np.percentile(samples, percentile)
+        expected_cvar = samples[samples <= var[i]].mean()
+        assert cvar[i] == pytest.approx(float(expected_cvar), rel=1e-6)
+
+
+def test_cvar_counts_ties_outside_the_sorted_tail():
+    # Kuyruk sınırındaki eşit değerler dilimin dışına taşar
+    samples = np.concatenate([np.full(500, 90.0), np.linspace(91.0, 120.0, 500)])
+    np.random.default_rng(1).shuffle(samples)
+    var, cvar = tail_risk_from_samples(samples, TAIL_CONFIDENCE_LEVELS)
+
+    np.testing.assert_array_equal(var, 90.0)
+    np.testing.assert_array_equal(cvar, 90.0)
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+@pytest.mark.parametrize("num_samples", [1, 2, 3, 7, 10_000, 200_001])
+def test_median_and_percentiles_come_from_the_same_selection(num_samples, dtype):
+    samples = _samples(num_samples, dtype, seed=2)
+    stats = sample_statistics(samples, TAIL_CONFIDENCE_LEVELS, percentiles=(2.5, 97.5))
+
+    assert stats["median"] == np.median(samples)
+    assert stats["percentiles"][0] == np.percentile(samples, 2.5)
+    assert stats["percentiles"][1] == np.percentile(samples, 97.5)
+
+
+def test_analysis_reuses_final_horizon_tail():
+    rng = np.random.default_rng(3)
+    price_paths = 100.0 * np.cumprod(1.0 + rng.normal(0.0005, 0.02, (41, 5000)), axis=0)
+    results = analyze_simulation_results(price_paths, 100.0, horizons=(10, 20, 40))
+
+    end_prices = price_paths[-1]
+    assert results["median_end_price"] == np.median(end_prices)
+    assert results["confidence_interval_95"] == (np.percentile(end_prices, 2.5), np.percentile(end_prices, 97.5))
+    assert results["var_95_value"] == np.percentile(end_prices, 5)
+    assert results["tail_risk"] == tail_risk_table(price_paths, 100.0, TAIL_CONFIDENCE_LEVELS, (10, 20, 40))